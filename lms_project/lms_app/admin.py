@@ -1,8 +1,11 @@
 from django.contrib import admin
+from django.db import transaction
 from django.utils import timezone
 from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import redirect
+from .circulation import borrows_returned
+from .fines import post_return_adjustments
 from .models import Book, Borrow, Student
 
 
@@ -39,13 +42,14 @@ class BorrowAdmin(admin.ModelAdmin):
         return custom_urls + urls
 
     def approve_borrow(self, request, borrow_id):
-        borrow = Borrow.objects.get(pk=borrow_id)
-        if borrow.book.quantity > 0:
-            borrow.book.quantity -= 1
-            borrow.book.save()
-            borrow.status = 'Approved'
-            borrow.message = f"Your borrow request for '{borrow.book.title}' has been approved"
-            borrow.save()
+        borrow = Borrow.objects.select_related('book').get(pk=borrow_id)
+        with transaction.atomic():
+            in_stock = Book.take_copy(borrow.book_id)
+            if in_stock:
+                borrow.status = 'Approved'
+                borrow.message = f"Your borrow request for '{borrow.book.title}' has been approved"
+                borrow.save(update_fields=['status', 'message'])
+        if in_stock:
             self.message_user(request, f"Borrow request for '{borrow.book.title}' approved.")
         else:
             self.message_user(request, f"Cannot approve '{borrow.book.title}' — out of stock.", level='error')
@@ -60,19 +64,16 @@ class BorrowAdmin(admin.ModelAdmin):
         return redirect(request.META.get('HTTP_REFERER'))
 
     def mark_as_returned(self, request, queryset):
-        for borrow in queryset:
-            if not borrow.is_returned:
-                borrow.is_returned = True
-                borrow.return_date = timezone.now()
-                borrow.save()
-                book = borrow.book
-                if hasattr(book, 'quantity'):
-                    book.quantity = (book.quantity or 0) + 1
-                elif hasattr(book, 'available_copies'):
-                    book.available_copies = (book.available_copies or 0) + 1
-                else:
-                    book.quantity = getattr(book, 'quantity', 0) + 1
-                book.save()
+        for borrow_id, book_id in queryset.filter(is_returned=False).values_list('id', 'book_id'):
+            with transaction.atomic():
+                returned = Borrow.objects.filter(pk=borrow_id, is_returned=False).update(
+                    is_returned=True,
+                    return_date=timezone.localdate(),
+                )
+                if returned:
+                    Book.return_copy(book_id)
+                    post_return_adjustments([borrow_id])
+                    borrows_returned([borrow_id])
         self.message_user(request, "Selected records marked as returned.")
     mark_as_returned.short_description = "Mark selected borrow records as returned"
 
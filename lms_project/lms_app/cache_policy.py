@@ -0,0 +1,33 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import etag
+
+
+def make_etag(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()[:20]
+
+
+def revalidate(etag_func):
+    """
+    Per-view cache policy for polled and catalog responses: the browser may
+    keep the body but must check back on every use. ``etag_func(request,
+    *args, **kwargs)`` builds the ETag from version counters only; when it
+    matches If-None-Match the view never runs and the reply is a bare
+    ``304 Not Modified``. Returning None from ``etag_func`` skips the check.
+
+    Views without a policy get CachePolicyMiddleware's no-store default.
+    Apply this inside the login decorator so 304s are only sent after the
+    user is checked.
+    """
+    def decorator(view_func):
+        conditional_view = etag(etag_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,225 @@
+import base64
+import json
+import math
+import time
+from datetime import date
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Book
+from .search import search_books
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+CATALOG_VERSION_KEY = 'catalog_version'
+FACET_FIELDS = ('category', 'department', 'language')
+FACET_PLACEHOLDERS = ('', 'dummy')
+
+# sort key -> (field, descending). Every ordering is tie-broken on id so the
+# keyset cursor always points at exactly one row.
+SORT_OPTIONS = {
+    '': ('id', False),
+    'title-asc': ('title', False),
+    'title-desc': ('title', True),
+    'author-asc': ('author', False),
+    'avail-desc': ('quantity', True),
+    'relevance': ('search_rank', True),
+}
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def cursor_int(value):
+    if isinstance(value, bool):
+        raise TypeError('not an integer')
+    value = int(value)
+    # SQLite and PostgreSQL bigint range; larger values overflow the driver.
+    if not -2 ** 63 <= value < 2 ** 63:
+        raise ValueError('integer out of range')
+    return value
+
+
+def cursor_float(value):
+    if isinstance(value, bool):
+        raise TypeError('not a number')
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError('not a finite number')
+    return value
+
+
+def cursor_str(value):
+    if not isinstance(value, str):
+        raise TypeError('not a string')
+    return value
+
+
+def cursor_date(value):
+    return date.fromisoformat(cursor_str(value))
+
+
+# Converter for the cursor value of each SORT_OPTIONS field.
+CURSOR_TYPES = {
+    'id': cursor_int,
+    'title': cursor_str,
+    'author': cursor_str,
+    'quantity': cursor_int,
+    'search_rank': cursor_float,
+}
+
+
+def decode_cursor(cursor, types):
+    """
+    Decode a cursor from encode_cursor() and pass each value through the
+    matching converter in ``types``. Returns None (start from the first
+    page) for a missing, malformed or tampered cursor, so a bad value never
+    reaches a filter() and turns into a 500.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(types):
+        return None
+    try:
+        return [convert(value) for convert, value in zip(types, values)]
+    except (ValueError, TypeError):
+        return None
+
+
+def filter_books(params):
+    """Apply the dashboard search box, facet selects and availability toggle."""
+    books = Book.objects.all()
+
+    term = params.get('q', '').strip()
+    if term:
+        books = search_books(books, term)
+
+    category = params.get('category', '').strip()
+    if category:
+        books = books.filter(category__iexact=category)
+    department = params.get('department', '').strip()
+    if department:
+        books = books.filter(department__iexact=department)
+    language = params.get('language', '').strip()
+    if language:
+        books = books.filter(language__iexact=language)
+
+    if params.get('available') in ('1', 'true', 'on'):
+        books = books.filter(quantity__gt=0)
+
+    return books
+
+
+def _after_cursor(books, field, descending, cursor):
+    last_value, last_id = cursor
+    if field == 'id':
+        return books.filter(id__lt=last_id) if descending else books.filter(id__gt=last_id)
+    op = 'lt' if descending else 'gt'
+    return books.filter(
+        Q(**{f'{field}__{op}': last_value}) | Q(**{field: last_value, 'id__gt': last_id})
+    )
+
+
+def paginate_books(books, sort='', cursor=None, limit=PAGE_SIZE):
+    """
+    Return one keyset page of ``books`` as ``(page, next_cursor)``.
+
+    The cursor carries the sort value and id of the last row served, so each
+    page is a single indexed range scan no matter how deep the client scrolls.
+    """
+    searching = 'search_rank' in books.query.annotations
+    if not sort and searching:
+        sort = 'relevance'
+    elif sort == 'relevance' and not searching:
+        sort = ''
+    field, descending = SORT_OPTIONS.get(sort, SORT_OPTIONS[''])
+    if field == 'id':
+        ordering = ['-id'] if descending else ['id']
+    else:
+        ordering = [f'-{field}' if descending else field, 'id']
+    books = books.order_by(*ordering)
+
+    position = decode_cursor(cursor, (CURSOR_TYPES[field], cursor_int))
+    if position is not None:
+        books = _after_cursor(books, field, descending, position)
+
+    page = list(books[:limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        last = page[-1]
+        next_cursor = encode_cursor([getattr(last, field), last.id])
+
+    return page, next_cursor
+
+
+def page_size_from(params):
+    try:
+        limit = int(params.get('limit', PAGE_SIZE))
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    # After commit, so a reader cannot cache pre-commit rows under the new
+    # version.
+    def bump():
+        try:
+            cache.incr(CATALOG_VERSION_KEY)
+        except ValueError:
+            cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+    transaction.on_commit(bump)
+
+
+_facet_memo = {'version': None, 'facets': None}
+
+
+def get_facets():
+    """
+    Return ``{'category': [(value, count), ...], ...}`` for the dashboard
+    filters, excluding the 'dummy' placeholder.
+
+    Facets are computed once per catalog version, shared through the cache
+    and memoised in-process, so a dashboard hit costs one cache read.
+    """
+    version = catalog_version()
+    if _facet_memo['version'] == version:
+        return _facet_memo['facets']
+
+    key = f'catalog_facets:{version}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = {}
+        for field in FACET_FIELDS:
+            rows = (
+                Book.objects.exclude(**{f'{field}__in': FACET_PLACEHOLDERS})
+                .order_by(field)
+                .values_list(field)
+                .annotate(count=Count('id'))
+            )
+            facets[field] = list(rows)
+        cache.set(key, facets, timeout=24 * 3600)
+
+    _facet_memo['version'] = version
+    _facet_memo['facets'] = facets
+    return facets
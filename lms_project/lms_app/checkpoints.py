@@ -0,0 +1,50 @@
+from django.utils import timezone
+
+from .models import ScanCheckpoint
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def start_scan(job, resume=False):
+    """
+    Return the ScanCheckpoint for ``job``, reset for a fresh run unless
+    ``resume`` is set and today's run of the job stopped before finishing.
+    """
+    today = timezone.localdate()
+    checkpoint, _ = ScanCheckpoint.objects.get_or_create(job=job, defaults={'run_date': today})
+    if not (resume and checkpoint.run_date == today and not checkpoint.finished):
+        checkpoint.last_pk = 0
+    checkpoint.run_date = today
+    checkpoint.finished = False
+    checkpoint.save()
+    return checkpoint
+
+
+def scan(queryset, checkpoint, chunk_size=DEFAULT_CHUNK_SIZE, before_save=None):
+    """
+    Stream ``queryset`` in primary-key order after ``checkpoint.last_pk``,
+    fetching ``chunk_size`` rows at a time so memory stays flat however many
+    rows match. Progress is saved after every ``chunk_size`` rows the caller
+    has finished with, and the checkpoint is marked finished when the scan
+    runs out.
+
+    A caller that hands rows off to be finished elsewhere (e.g. emails
+    queued to an EmailDispatcher) passes ``before_save`` to complete that
+    work first, so the checkpoint never moves past a row whose outcome is
+    not yet recorded.
+    """
+    done = 0
+    rows = queryset.filter(pk__gt=checkpoint.last_pk).order_by('pk').iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield row
+        # Control only comes back here once the caller is done with ``row``.
+        checkpoint.last_pk = row.pk
+        done += 1
+        if done % chunk_size == 0:
+            if before_save:
+                before_save()
+            checkpoint.save(update_fields=['last_pk', 'updated_at'])
+    if before_save:
+        before_save()
+    checkpoint.finished = True
+    checkpoint.save(update_fields=['last_pk', 'finished', 'updated_at'])
@@ -0,0 +1,100 @@
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Borrow, DailyCirculationStats
+
+
+def _add(field, counts):
+    """
+    Add ``counts`` ({(date, book_id): n}, n may be negative) to ``field`` of
+    the matching DailyCirculationStats rows, creating rows as needed.
+    """
+    for (day, book_id), count in counts.items():
+        if not count or day is None:
+            continue
+        rows = DailyCirculationStats.objects.filter(date=day, book_id=book_id)
+        if count < 0:
+            # Nothing to take away from a day that was never counted
+            # (e.g. before the first backfill).
+            rows.filter(**{f'{field}__gte': -count}).update(**{field: F(field) + count})
+            continue
+        if rows.update(**{field: F(field) + count}):
+            continue
+        try:
+            with transaction.atomic():
+                DailyCirculationStats.objects.create(date=day, book_id=book_id, **{field: count})
+        except IntegrityError:
+            # Another writer created the row between our UPDATE and INSERT.
+            rows.update(**{field: F(field) + count})
+
+
+def _grouped(borrow_ids, date_field, sign=1, **filters):
+    rows = (
+        Borrow.objects.filter(id__in=borrow_ids, **filters)
+        .order_by()
+        .values(date_field, 'book_id')
+        .annotate(n=Count('id'))
+    )
+    return {(row[date_field], row['book_id']): sign * row['n'] for row in rows}
+
+
+def borrow_saved(borrow, created):
+    if created:
+        _apply(borrow, 1)
+
+
+def borrow_deleted(borrow):
+    _apply(borrow, -1)
+
+
+def _apply(borrow, sign):
+    key = (borrow.borrow_date, borrow.book_id)
+    _add('borrows', {key: sign})
+    if borrow.status == 'rejected':
+        _add('rejections', {key: sign})
+    if borrow.is_returned:
+        _add('returns', {(borrow.return_date, borrow.book_id): sign})
+
+
+def borrows_rejected(borrow_ids, undo=False):
+    """Count borrows that just became rejected; ``undo`` when they stop being."""
+    _add('rejections', _grouped(borrow_ids, 'borrow_date', -1 if undo else 1))
+
+
+def borrows_returned(borrow_ids):
+    """Count loans that were just marked returned, on their return_date."""
+    _add('returns', _grouped(borrow_ids, 'return_date', is_returned=True))
+
+
+def rebuild(since=None):
+    """
+    Recompute DailyCirculationStats from Borrow, for every day or only from
+    ``since`` on. Returns the number of rows written.
+    """
+    counts = defaultdict(Counter)
+    sources = (
+        ('borrows', 'borrow_date', Borrow.objects.all()),
+        ('rejections', 'borrow_date', Borrow.objects.filter(status='rejected')),
+        ('returns', 'return_date', Borrow.objects.filter(is_returned=True, return_date__isnull=False)),
+    )
+    with transaction.atomic():
+        for field, date_field, borrows in sources:
+            if since:
+                borrows = borrows.filter(**{f'{date_field}__gte': since})
+            for (day, book_id), n in _grouped(borrows.values('id'), date_field).items():
+                counts[day, book_id][field] = n
+
+        stale = DailyCirculationStats.objects.all()
+        if since:
+            stale = stale.filter(date__gte=since)
+        stale.delete()
+        DailyCirculationStats.objects.bulk_create(
+            [
+                DailyCirculationStats(date=day, book_id=book_id, **fields)
+                for (day, book_id), fields in counts.items()
+            ],
+            batch_size=500,
+        )
+    return len(counts)
@@ -0,0 +1,69 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .live import PENDING, changed
+from .models import Borrow, Notification, Student
+
+PENDING_COUNTS_KEY = 'pending_counts'
+# Writers delete the keys after commit; the TTL only bounds how long a
+# count recomputed during a concurrent write can stay stale.
+COUNTER_TIMEOUT = 300
+
+
+def _unread_key(student_id):
+    return f'unread_count:{student_id}'
+
+
+def _version_key(student_id):
+    return f'notification_version:{student_id}'
+
+
+def unread_count(student_id):
+    """A student's unread notifications, counted once and then read from the cache."""
+    key = _unread_key(student_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(student_id=student_id, is_read=False).count()
+        cache.set(key, count, timeout=COUNTER_TIMEOUT)
+    return count
+
+
+def notification_version(student_id):
+    """A token that changes whenever the student's notifications do; used as their ETag."""
+    key = _version_key(student_id)
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        token = cache.get(key)
+    return token
+
+
+def pending_counts():
+    """Pending borrow requests and signups for the admin badges, cached like unread_count()."""
+    counts = cache.get(PENDING_COUNTS_KEY)
+    if counts is None:
+        counts = {
+            'borrow_pending': Borrow.objects.filter(status='pending').count(),
+            'signup_pending': Student.objects.filter(status='pending').count(),
+        }
+        cache.set(PENDING_COUNTS_KEY, counts, timeout=COUNTER_TIMEOUT)
+    return counts
+
+
+def notifications_changed(student_ids):
+    """Call after creating, reading or deleting notifications for ``student_ids``."""
+    student_ids = set(student_ids)
+    if student_ids:
+        def invalidate():
+            cache.delete_many([_unread_key(student_id) for student_id in student_ids])
+            token = uuid.uuid4().hex
+            cache.set_many({_version_key(student_id): token for student_id in student_ids}, timeout=None)
+        transaction.on_commit(invalidate)
+
+
+def pending_changed():
+    """Call after a borrow request or signup is created or changes status."""
+    transaction.on_commit(lambda: cache.delete(PENDING_COUNTS_KEY))
+    changed(PENDING)
@@ -0,0 +1,68 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from .models import Admin
+
+ADMIN_EMAILS_KEY = 'active_admin_emails'
+MAX_RENDERED = 512
+
+# Context values that hash to a stable key. Contexts holding anything else
+# (model instances, querysets) are rendered every time.
+_HASHABLE = (str, int, float, bool, Decimal, date, type(None))
+
+_rendered = OrderedDict()
+_lock = threading.Lock()
+
+
+def _context_key(template_name, context):
+    items = sorted(context.items())
+    if not all(isinstance(value, _HASHABLE) for _, value in items):
+        return None
+    raw = repr((template_name, [(key, type(value).__name__, str(value)) for key, value in items]))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def render_email(template_name, context):
+    """
+    Return ``(html, text)`` for an email body. Each distinct (template,
+    context) is rendered and stripped to plain text once per process, so a
+    body shared by several recipients, or re-sent on a later run, costs a
+    dict lookup instead of a template render plus strip_tags().
+    """
+    key = _context_key(template_name, context)
+    if key is not None:
+        with _lock:
+            body = _rendered.get(key)
+            if body is not None:
+                _rendered.move_to_end(key)
+                return body
+
+    html = render_to_string(template_name, context)
+    body = (html, strip_tags(html))
+
+    if key is not None:
+        with _lock:
+            _rendered[key] = body
+            while len(_rendered) > MAX_RENDERED:
+                _rendered.popitem(last=False)
+    return body
+
+
+def active_admin_emails():
+    """Emails of active admins, cached until an Admin is saved or deleted."""
+    emails = cache.get(ADMIN_EMAILS_KEY)
+    if emails is None:
+        emails = list(Admin.objects.filter(is_active=True).values_list('email', flat=True))
+        cache.set(ADMIN_EMAILS_KEY, emails, timeout=None)
+    return emails
+
+
+def invalidate_admin_emails():
+    cache.delete(ADMIN_EMAILS_KEY)
@@ -0,0 +1,175 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import (
+    Case, DecimalField, ExpressionWrapper, F, Func, IntegerField, OuterRef, Q, Subquery, Sum,
+    Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Borrow, FineLedger, FineWaiver, Student
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=MONEY)
+
+
+class DaysBetween(Func):
+    """Whole days from ``start`` to ``end`` (both DateFields) as an integer."""
+
+    output_field = IntegerField()
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context,
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='(%(expressions)s)',
+            arg_joiner='::date - ',
+            **extra_context,
+        )
+
+
+def open_overdue(today):
+    return Q(is_returned=False, expected_return_date__lt=today)
+
+
+def approved_waivers_total():
+    totals = (
+        FineWaiver.objects.filter(borrow=OuterRef('pk'), status='approved')
+        .order_by()
+        .values('borrow')
+        .annotate(total=Sum('waived_amount'))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals, output_field=MONEY), ZERO)
+
+
+def annotate_live_fines(borrows, today=None):
+    """
+    Annotate ``overdue_days`` and ``live_fine`` on a Borrow queryset.
+
+    For loans still out past their due date the fine is computed in SQL as
+    overdue days x ``book.fine_rate`` less approved waivers, floored at zero
+    (the same result as ``Borrow.calculate_fine()``); every other row reports
+    its stored ``fine_amount``.
+    """
+    today = today or timezone.localdate()
+    overdue = open_overdue(today)
+    overdue_days = Case(
+        When(overdue, then=DaysBetween(Value(today), F('expected_return_date'))),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    gross = F('overdue_days') * F('book__fine_rate')
+    return borrows.annotate(overdue_days=overdue_days).annotate(
+        live_fine=Case(
+            When(overdue, then=Greatest(
+                ExpressionWrapper(gross - approved_waivers_total(), output_field=MONEY),
+                ZERO,
+            )),
+            default=F('fine_amount'),
+            output_field=MONEY,
+        ),
+    )
+
+
+def accrue_fines(day):
+    """
+    Post one day of fines for every open loan overdue on ``day`` with a
+    single INSERT ... SELECT. The per-day unique constraint makes a re-run
+    for the same day a no-op. Returns the number of entries added.
+    """
+    ledger = FineLedger._meta.db_table
+    borrow = Borrow._meta.db_table
+    book = Borrow._meta.get_field('book').related_model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {ledger} (borrow_id, student_id, entry_type, amount, entry_date, created_at)
+            SELECT b.id, b.student_id, 'accrual', bk.fine_rate, %s, %s
+            FROM {borrow} b INNER JOIN {book} bk ON bk.id = b.book_id
+            WHERE b.status = 'approved' AND b.is_returned = %s AND b.expected_return_date < %s
+            ON CONFLICT DO NOTHING
+            """,
+            [
+                connection.ops.adapt_datefield_value(day),
+                connection.ops.adapt_datetimefield_value(timezone.now()),
+                False,
+                connection.ops.adapt_datefield_value(day),
+            ],
+        )
+        added = cursor.rowcount
+    if added:
+        refresh_fine_balances(
+            FineLedger.objects.filter(entry_type='accrual', entry_date=day).values('student')
+        )
+    return added
+
+
+def refresh_fine_balances(student_ids):
+    """Recompute ``Student.fine_balance`` from the ledger for ``student_ids``."""
+    totals = (
+        FineLedger.objects.filter(student=OuterRef('pk'))
+        .order_by()
+        .values('student')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    Student.objects.filter(id__in=student_ids).update(
+        fine_balance=Coalesce(Subquery(totals, output_field=MONEY), ZERO),
+    )
+
+
+def post_waiver(waiver):
+    """
+    Offset the ledger by an approved waiver, in full, the same way the live
+    fine subtracts it. A waiver never exceeds the live fine when requested,
+    so the loan's balance is only negative until the nightly accrual catches
+    up with today; capping it at what was posted would leave the ledger
+    short of the live fine for every later accrual.
+    """
+    student_id = Borrow.objects.values_list('student_id', flat=True).get(id=waiver.borrow_id)
+    if waiver.waived_amount <= 0:
+        return
+    FineLedger.objects.create(
+        borrow_id=waiver.borrow_id,
+        student_id=student_id,
+        entry_type='waiver',
+        amount=-waiver.waived_amount,
+        entry_date=timezone.localdate(),
+    )
+    refresh_fine_balances([student_id])
+
+
+def post_return_adjustments(borrow_ids):
+    """
+    Settle the ledger for returned loans so each one's balance equals its
+    final ``fine_amount``; this picks up days the nightly job never posted.
+    """
+    rows = (
+        Borrow.objects.filter(id__in=borrow_ids, is_returned=True)
+        .annotate(posted=Coalesce(Sum('ledger_entries__amount'), ZERO))
+        .values_list('id', 'student_id', 'fine_amount', 'posted')
+    )
+    today = timezone.localdate()
+    entries = [
+        FineLedger(
+            borrow_id=borrow_id, student_id=student_id, entry_type='return',
+            amount=fine_amount - posted, entry_date=today,
+        )
+        for borrow_id, student_id, fine_amount, posted in rows
+        if fine_amount != posted
+    ]
+    if entries:
+        FineLedger.objects.bulk_create(entries)
+        refresh_fine_balances({entry.student_id for entry in entries})
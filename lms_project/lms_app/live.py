@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+
+# Topics a page can watch. Every write that changes what a watcher would
+# see calls changed(topic). Notifications are watched per student through
+# counters.notification_version() instead, so one student's notification
+# never wakes everyone else's connection.
+PENDING = 'pending'
+# Book stock and rating aggregates, which change through QuerySet.update()
+# and so never touch catalog_version().
+STOCK = 'stock'
+
+TICK = 1.0
+KEEPALIVE = 15
+# Streams end after this long and the browser reconnects, so a worker
+# never holds a forgotten tab forever.
+STREAM_LIFETIME = 300
+RETRY_MS = 3000
+# Long polls hold a WSGI worker thread (3 workers x 8 threads in Docker),
+# so they wait only briefly, and the client pauses POLL_INTERVAL_MS between
+# polls. Each open tab then occupies a thread for about one-sixth of the
+# time rather than all of it.
+LONG_POLL_TIMEOUT = 2
+POLL_INTERVAL_MS = 10000
+
+# {topic: (read at, version)}; lets every stream and long poll in this
+# process share one cache read per tick.
+_versions = {}
+
+
+def _key(topic):
+    return f'live_version:{topic}'
+
+
+def changed(topic):
+    """
+    Give ``topic`` a new version once the current transaction commits. A
+    fresh random token (not a counter) means two writers racing can never
+    leave the version looking unchanged.
+    """
+    def bump():
+        token = uuid.uuid4().hex
+        cache.set(_key(topic), token, timeout=None)
+        _versions[topic] = (time.monotonic(), token)
+    transaction.on_commit(bump)
+
+
+def version(topic):
+    now = time.monotonic()
+    seen = _versions.get(topic)
+    if seen is not None and now - seen[0] < TICK:
+        return seen[1]
+    token = cache.get(_key(topic))
+    if token is None:
+        # Seed it, so a version lost to eviction never matches an old ETag.
+        cache.add(_key(topic), uuid.uuid4().hex, timeout=None)
+        token = cache.get(_key(topic), '')
+    _versions[topic] = (now, token)
+    return token
+
+
+def _digest(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def live_response(request, current_version, build):
+    """
+    Keep a page up to date with ``build()``, a JSON-serialisable dict for
+    the current user. ``current_version()`` returns a token that changes
+    whenever ``build()`` might, e.g. ``lambda: version(PENDING)``. Watchers
+    only compare that token while nothing changes, and run ``build()`` when
+    it moves; the payload is sent only if it differs from the last one the
+    client got.
+
+    Under ASGI, EventSource requests get a Server-Sent Events stream. WSGI
+    workers cannot hold streams open, so they answer EventSource with 204
+    (which stops it reconnecting) and serve short long polls instead: pass
+    back the ``cursor`` from the previous response, the request waits up to
+    LONG_POLL_TIMEOUT seconds for a change, and the client waits ``retry``
+    milliseconds before polling again.
+    """
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+        response = StreamingHttpResponse(_stream(current_version, build), content_type='text/event-stream')
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    payload = _long_poll(request.GET.get('cursor', ''), current_version, build)
+    response = JsonResponse({**payload, 'retry': POLL_INTERVAL_MS})
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def _long_poll(cursor, current_version, build):
+    seen_version, _, seen_digest = cursor.partition('.')
+    deadline = time.monotonic() + LONG_POLL_TIMEOUT
+    while True:
+        current = current_version()
+        if not cursor or current != seen_version:
+            payload = build()
+            digest = _digest(payload)
+            if digest != seen_digest:
+                return {**payload, 'cursor': f'{current}.{digest}'}
+            seen_version = current
+        if time.monotonic() >= deadline:
+            return {'cursor': f'{seen_version}.{seen_digest}'}
+        time.sleep(TICK)
+
+
+async def _stream(current_version, build):
+    get_version = sync_to_async(current_version, thread_sensitive=False)
+    build = sync_to_async(build)
+    seen_version = seen_digest = None
+    started = last_sent = time.monotonic()
+    yield f'retry: {RETRY_MS}\n\n'
+    while time.monotonic() - started < STREAM_LIFETIME:
+        current = await get_version()
+        if current != seen_version:
+            seen_version = current
+            payload = await build()
+            digest = _digest(payload)
+            if digest != seen_digest:
+                seen_digest = digest
+                last_sent = time.monotonic()
+                yield f'data: {json.dumps(payload, default=str)}\n\n'
+        if time.monotonic() - last_sent >= KEEPALIVE:
+            last_sent = time.monotonic()
+            yield ': keepalive\n\n'
+        await asyncio.sleep(TICK)
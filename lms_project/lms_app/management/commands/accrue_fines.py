@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from lms_app.fines import accrue_fines
+
+
+class Command(BaseCommand):
+    help = (
+        "Post one day's fine accrual to the FineLedger for every overdue loan. "
+        "Safe to re-run: a loan accrues at most once per day. Schedule nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Accrual day as YYYY-MM-DD (default: today).',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=1,
+            help='Also accrue the N-1 days before --date, to catch up after missed runs.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            end = date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        except ValueError:
+            raise CommandError('--date must be YYYY-MM-DD.')
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1.')
+
+        total = 0
+        for offset in range(options['days'] - 1, -1, -1):
+            day = end - timedelta(days=offset)
+            with transaction.atomic():
+                added = accrue_fines(day)
+            total += added
+            self.stdout.write(f'{day.isoformat()}: {added} accrual(s) posted')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"accrue_fines: Posted {total} accrual(s) over {options['days']} day(s)."
+        ))
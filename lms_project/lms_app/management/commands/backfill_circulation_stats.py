@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lms_app.circulation import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the DailyCirculationStats rollup behind the admin dashboard "
+        "charts from Borrow. Run once after migrating, and again after any "
+        "bulk edit that bypassed the app (e.g. raw SQL or the Django admin)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days from this date on (YYYY-MM-DD); default: all days.')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format.')
+        written = rebuild(since)
+        scope = f'from {since}' if since else 'for all days'
+        self.stdout.write(self.style.SUCCESS(
+            f"backfill_circulation_stats: wrote {written} day/book row(s) {scope}."
+        ))
@@ -0,0 +1,61 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from lms_app import email_rendering
+from lms_app.email_rendering import render_email
+
+TEMPLATE = 'emails/return_reminder.html'
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark email body rendering: render_to_string + strip_tags for "
+        "every message (the old path) against render_email(). No mail is sent."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000, help='Bodies to render per run (default: 2000).')
+        parser.add_argument('--distinct', type=int, default=50,
+                            help='Distinct contexts cycled through, e.g. borrows in a run (default: 50).')
+
+    def handle(self, *args, **options):
+        messages, distinct = options['messages'], options['distinct']
+        if messages < 1 or distinct < 1:
+            raise CommandError('--messages and --distinct must be at least 1.')
+
+        due = date.today() + timedelta(days=2)
+        contexts = [
+            {
+                'student_name': f'Student {i}',
+                'book_title': f'Book {i}',
+                'book_author': 'Author',
+                'expected_return_date': due,
+                'days_remaining': 2,
+            }
+            for i in range(distinct)
+        ]
+        # Warm the template loader so both runs measure rendering only.
+        render_to_string(TEMPLATE, contexts[0])
+
+        start = time.perf_counter()
+        for i in range(messages):
+            html = render_to_string(TEMPLATE, contexts[i % distinct])
+            strip_tags(html)
+        before = time.perf_counter() - start
+
+        email_rendering._rendered.clear()
+        start = time.perf_counter()
+        for i in range(messages):
+            render_email(TEMPLATE, contexts[i % distinct])
+        after = time.perf_counter() - start
+
+        self.stdout.write(f'  {messages} bodies over {distinct} distinct context(s)')
+        self.stdout.write(f'  render_to_string + strip_tags: {messages / before:10.0f} renders/s')
+        self.stdout.write(f'  render_email:                  {messages / after:10.0f} renders/s')
+        self.stdout.write(self.style.SUCCESS(
+            f"bench_email_render: {before / after:.1f}x faster with render-once bodies."
+        ))
@@ -0,0 +1,115 @@
+import io
+import statistics
+import uuid
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from lms_app.management.commands.send_notifications import Command as SendNotifications
+from lms_app.models import Book, Borrow, Student
+from lms_app.smtp_sink import SMTPSink
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark send_notifications against a local SMTP sink: seed N overdue "
+        "borrows, send over real SMTP, report throughput, send latency and DB "
+        "queries per message. Everything seeded or logged is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--borrows', type=int, default=200, help='Overdue borrows to seed (default: 200).')
+        parser.add_argument('--workers', type=int, default=1, help='send_notifications --workers (default: 1).')
+        parser.add_argument('--rate', type=float, default=0, help='send_notifications --rate; 0 for no cap (default: 0).')
+        parser.add_argument('--latency', type=float, default=20,
+                            help='Milliseconds the sink waits before answering each message (default: 20).')
+        parser.add_argument('--fail-rate', type=float, default=0, help='Fraction of messages the sink rejects with a 550.')
+        parser.add_argument('--drop-rate', type=float, default=0,
+                            help='Fraction of messages the sink answers by closing the connection.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for failure injection.')
+
+    def handle(self, *args, **options):
+        if options['borrows'] < 1 or options['workers'] < 1:
+            raise CommandError('--borrows and --workers must be at least 1.')
+        if options['latency'] < 0 or options['rate'] < 0:
+            raise CommandError('--latency and --rate cannot be negative.')
+        if not 0 <= options['fail_rate'] + options['drop_rate'] <= 1:
+            raise CommandError('--fail-rate and --drop-rate must be fractions adding up to at most 1.')
+
+        sink = SMTPSink(
+            latency=options['latency'] / 1000,
+            fail_rate=options['fail_rate'],
+            drop_rate=options['drop_rate'],
+            seed=options['seed'],
+        )
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        command = SendNotifications()
+        with sink, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=sink.host,
+            EMAIL_PORT=sink.port,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_TIMEOUT=10,
+        ):
+            with transaction.atomic():
+                self._seed(options['borrows'])
+                with connection.execute_wrapper(count_queries):
+                    call_command(command, workers=options['workers'], rate=options['rate'], stdout=io.StringIO())
+                transaction.set_rollback(True)
+
+        dispatcher = command.dispatcher
+        messages = dispatcher.sent + dispatcher.failed
+        latencies = sorted(dispatcher.latencies)
+        if len(latencies) > 1:
+            cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+            p50, p99 = cuts[49], cuts[98]
+        else:
+            p50 = p99 = latencies[0] if latencies else 0.0
+
+        self.stdout.write(f"  {options['borrows']} overdue borrow(s), {options['workers']} worker(s), "
+                          f"{options['latency']:g}ms sink latency")
+        self.stdout.write(f"  Messages:      {dispatcher.sent} sent, {dispatcher.failed} failed")
+        self.stdout.write(f"  Sink:          {sink.accepted} accepted, {sink.rejected} rejected, "
+                          f"{sink.dropped} dropped over {sink.connections} connection(s)")
+        self.stdout.write(f"  Throughput:    {dispatcher.throughput:.1f} msg/s over {dispatcher.elapsed:.2f}s")
+        self.stdout.write(f"  Send latency:  p50 {p50 * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms")
+        self.stdout.write(f"  DB queries:    {queries[0]} ({queries[0] / max(messages, 1):.2f} per message)")
+        self.stdout.write(self.style.SUCCESS(
+            f"bench_notifications: {dispatcher.throughput:.1f} msg/s, "
+            f"{queries[0] / max(messages, 1):.2f} queries/message."
+        ))
+
+    def _seed(self, count):
+        tag = uuid.uuid4().hex[:8]
+        book = Book.objects.create(title=f'Bench Book {tag}', author='Bench', isbn=f'B{tag}', quantity=count)
+        users = User.objects.bulk_create([
+            User(username=f'bench-{tag}-{i}', email=f'bench-{tag}-{i}@example.com', password='!')
+            for i in range(count)
+        ])
+        students = Student.objects.bulk_create([
+            Student(user=user, roll_no=f'B{tag}{i}', branch='Bench', status='approved')
+            for i, user in enumerate(users)
+        ])
+        today = date.today()
+        Borrow.objects.bulk_create([
+            Borrow(
+                student=student,
+                book=book,
+                status='approved',
+                is_approved=True,
+                expected_return_date=today - timedelta(days=i % 30 + 1),
+            )
+            for i, student in enumerate(students)
+        ])
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from lms_app.models import Book, BookReview
+
+
+def _review_stat(aggregate, **filters):
+    stat = (
+        BookReview.objects.filter(book=OuterRef('pk'), **filters)
+        .order_by()
+        .values('book')
+        .annotate(value=aggregate)
+        .values('value')
+    )
+    return Coalesce(Subquery(stat, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every book's denormalised rating aggregates (review count, "
+        "rating sum and per-star histogram) from BookReview in one UPDATE."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = Book.objects.update(
+                review_count=_review_stat(Count('id')),
+                rating_sum=_review_stat(Sum('rating')),
+                **{
+                    f'rating_{star}_count': _review_stat(Count('id'), rating=star)
+                    for star in range(1, 6)
+                },
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"rebuild_book_ratings: Recomputed ratings for {updated} book(s)."
+        ))
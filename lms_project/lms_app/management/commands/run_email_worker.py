@@ -0,0 +1,52 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from lms_app.notifications import email_batch
+from lms_app.outbox import claim_batch, deliver
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued EmailOutbox mail. Runs until stopped, polling for new "
+        "rows; several workers may run at once. Use --once to drain and exit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+        parser.add_argument('--batch-size', type=int, default=20, help='Rows claimed per round (default: 20).')
+        parser.add_argument('--poll', type=float, default=5.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--max-attempts', type=int, default=6,
+                            help='Attempts before a message is marked failed (default: 6).')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['max_attempts'] < 1:
+            raise CommandError('--batch-size and --max-attempts must be at least 1.')
+
+        total_sent = total_failed = 0
+        try:
+            while True:
+                close_old_connections()
+                # Hold one SMTP connection while there is work; drop it when idle.
+                with email_batch() as batch:
+                    while True:
+                        rows = claim_batch(options['batch_size'])
+                        if not rows:
+                            break
+                        sent, failed = deliver(rows, batch, options['max_attempts'])
+                        total_sent += sent
+                        total_failed += failed
+                        self.stdout.write(f'  Delivered {sent}, failed {failed}')
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            logger.info('run_email_worker: interrupted')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"run_email_worker: {total_sent} sent, {total_failed} failed attempt(s)."
+        ))
@@ -1,58 +1,106 @@
 import logging
 
 from django.core.management.base import BaseCommand, CommandError
-from django.db.models import Q
 from django.utils import timezone
 
+from lms_app.checkpoints import DEFAULT_CHUNK_SIZE, scan, start_scan
+from lms_app.counters import notifications_changed
 from lms_app.models import Borrow, Notification
-from lms_app.views import create_notification
 
 logger = logging.getLogger(__name__)
 
 
+def _day_phrase(days_left):
+    if days_left == 0:
+        return 'today'
+    if days_left == 1:
+        return 'tomorrow'
+    return f'in {days_left} days'
+
+
 class Command(BaseCommand):
-    help = 'Create in-app due-date reminders for borrows due within 24 hours (i.e. tomorrow).'
+    help = (
+        'Create in-app due-date reminders for borrows due within the next few days '
+        '(default: today to 3 days out), at most one per borrow per day.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=3,
+            help='Remind borrows due between today and this many days from now (default: 3).',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help="Continue after the last borrow checkpointed by today's unfinished run.",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Borrows fetched per query and per checkpoint (default: {DEFAULT_CHUNK_SIZE}).',
+        )
 
     def handle(self, *args, **options):
-        self.stdout.write('Checking for borrows due tomorrow…')
-        created = 0
-        skipped = 0
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        if options['days'] < 0:
+            raise CommandError('--days cannot be negative.')
 
+        self.stdout.write(f"Checking for borrows due within {options['days']} day(s)…")
         try:
             today = timezone.now().date()
-            tomorrow = today + timezone.timedelta(days=1)
 
-            due_tomorrow = (
+            due_soon = (
                 Borrow.objects.filter(
                     is_returned=False,
                     status='approved',
-                    expected_return_date=tomorrow,
+                    expected_return_date__gte=today,
+                    expected_return_date__lte=today + timezone.timedelta(days=options['days']),
                 )
-                .select_related('student', 'book')
+                .select_related('book')
             )
 
-            cutoff = timezone.now() - timezone.timedelta(hours=24)
-
-            for borrow in due_tomorrow:
-                book_title = borrow.book.title
-                message = (
-                    f"Reminder: '{book_title}' is due tomorrow. "
-                    "Return it on time to avoid a fine."
-                )
+            # One reminder per borrow per day is enforced by the
+            # notif_once_per_day constraint, so each chunk is a single
+            # INSERT that skips borrows already reminded today.
+            reminders = Notification.objects.filter(kind='due_reminder', send_date=today)
+            before = reminders.count()
 
-                already_notified = Notification.objects.filter(
-                    Q(message__startswith=f"Reminder: '{book_title}' is due tomorrow") |
-                    Q(message__startswith=f'Reminder: "{book_title}" is due tomorrow'),
-                    student=borrow.student,
-                    created_at__gte=cutoff,
-                ).exists()
+            checkpoint = start_scan('send_due_reminders', options['resume'])
+            if checkpoint.last_pk:
+                self.stdout.write(f'Resuming after borrow #{checkpoint.last_pk}')
 
-                if already_notified:
-                    skipped += 1
-                    continue
+            pending = []
+            scanned = 0
+            student_ids = set()
+            for borrow in scan(due_soon, checkpoint, options['chunk_size']):
+                day_str = _day_phrase((borrow.expected_return_date - today).days)
+                pending.append(Notification(
+                    student_id=borrow.student_id,
+                    borrow=borrow,
+                    kind='due_reminder',
+                    send_date=today,
+                    message=(
+                        f"Reminder: '{borrow.book.title}' is due {day_str}. "
+                        "Return it on time to avoid a fine."
+                    ),
+                    link='/my-borrowed-books/',
+                ))
+                scanned += 1
+                student_ids.add(borrow.student_id)
+                # Write each chunk before scan() checkpoints past it.
+                if len(pending) == options['chunk_size']:
+                    Notification.objects.bulk_create(pending, ignore_conflicts=True)
+                    pending = []
+            Notification.objects.bulk_create(pending, ignore_conflicts=True)
 
-                create_notification(borrow.student, message, '/my-borrowed-books/')
-                created += 1
+            created = reminders.count() - before
+            skipped = scanned - created
+            if created:
+                notifications_changed(student_ids)
 
         except Exception as exc:
             logger.error('send_due_reminders failed: %s', exc, exc_info=True)
@@ -1,51 +1,137 @@
-from datetime import date, timedelta
-from django.core.management.base import BaseCommand
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from lms_app.checkpoints import DEFAULT_CHUNK_SIZE, scan, start_scan
+from lms_app.fines import annotate_live_fines
+from lms_app.email_rendering import active_admin_emails
 from lms_app.models import Borrow
 from lms_app.notifications import (
+    PENDING_CLAIM_LEASE,
+    email_dispatcher,
     send_return_reminder,
     send_overdue_admin_alert,
+    send_overdue_admin_digest,
     send_daily_fine_notification,
+    release_stale_claims,
+    sent_today_keys,
 )
 
 
 class Command(BaseCommand):
     help = 'Send scheduled email notifications for book returns, reminders, and fines'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--digest',
+            action='store_true',
+            help='Send each admin one overdue digest instead of an alert per overdue borrow.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Threads sending in parallel, each over its own SMTP connection (default: 1).',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=settings.EMAIL_RATE_LIMIT,
+            help='Maximum messages per second across all workers; 0 for no cap (default: EMAIL_RATE_LIMIT).',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help=(
+                "Continue after the last borrow checkpointed by today's unfinished run, "
+                "retrying sends it left pending. Only use once that run has stopped."
+            ),
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Borrows fetched per query and per checkpoint (default: {DEFAULT_CHUNK_SIZE}).',
+        )
+
     def handle(self, *args, **options):
-        today = date.today()
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1.')
+        if options['rate'] < 0:
+            raise CommandError('--rate cannot be negative.')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+
+        today = timezone.localdate()
         active_borrows = Borrow.objects.filter(
             status='approved',
             is_returned=False,
             expected_return_date__isnull=False,
         ).select_related('student', 'student__user', 'book')
 
+        # One query each up front instead of one per borrow x admin; the
+        # once-per-day constraint still guards against a concurrent run.
+        # A resumed run's predecessor is known to be dead, so its pending
+        # claims are released now instead of after PENDING_CLAIM_LEASE.
+        released = release_stale_claims(timedelta(0) if options['resume'] else PENDING_CLAIM_LEASE)
+        if released:
+            self.stdout.write(f'Retrying {released} send(s) left pending by an interrupted run')
+        sent_keys = sent_today_keys()
+        admin_emails = active_admin_emails()
+
+        checkpoint = start_scan('send_notifications', options['resume'])
+        if checkpoint.last_pk:
+            self.stdout.write(f"  Resuming after borrow #{checkpoint.last_pk}")
+
         reminder_count = 0
         overdue_count = 0
         fine_count = 0
 
-        for borrow in active_borrows:
-            days_until_due = (borrow.expected_return_date - today).days
-
-            if days_until_due in (7, 2, 1):
-                sent = send_return_reminder(borrow, days_until_due)
-                if sent:
-                    reminder_count += 1
-                    self.stdout.write(
-                        f"  Reminder ({days_until_due}d): {borrow.student.roll_no} - {borrow.book.title}"
-                    )
-
-            if days_until_due < 0:
-                sent = send_overdue_admin_alert(borrow)
-                if sent:
-                    overdue_count += 1
-
-                sent = send_daily_fine_notification(borrow)
-                if sent:
-                    fine_count += 1
-                    self.stdout.write(
-                        f"  Overdue ({abs(days_until_due)}d): {borrow.student.roll_no} - {borrow.book.title}"
-                    )
+        # Claims and log writes stay on this thread; the workers only send.
+        with email_dispatcher(options['workers'], options['rate']) as dispatcher:
+            # Outcomes are recorded before each checkpoint save, so --resume
+            # never skips a borrow whose mail was only queued.
+            borrows = scan(active_borrows, checkpoint, options['chunk_size'], before_save=dispatcher.drain)
+            for borrow in borrows:
+                days_until_due = (borrow.expected_return_date - today).days
+
+                if days_until_due in (7, 2, 1):
+                    sent = send_return_reminder(borrow, days_until_due, sent_keys=sent_keys)
+                    if sent:
+                        reminder_count += 1
+                        self.stdout.write(
+                            f"  Reminder ({days_until_due}d): {borrow.student.roll_no} - {borrow.book.title}"
+                        )
+
+                if days_until_due < 0:
+                    if not options['digest']:
+                        sent = send_overdue_admin_alert(borrow, admin_emails=admin_emails, sent_keys=sent_keys)
+                        if sent:
+                            overdue_count += 1
+
+                    sent = send_daily_fine_notification(borrow, sent_keys=sent_keys)
+                    if sent:
+                        fine_count += 1
+                        self.stdout.write(
+                            f"  Overdue ({abs(days_until_due)}d): {borrow.student.roll_no} - {borrow.book.title}"
+                        )
+
+            if options['digest']:
+                overdue = list(
+                    annotate_live_fines(Borrow.objects.filter(
+                        status='approved', is_returned=False, expected_return_date__lt=today,
+                    ), today=today)
+                    .select_related('student', 'book')
+                    .order_by('-live_fine', 'expected_return_date')
+                )
+                overdue_count = send_overdue_admin_digest(overdue, admin_emails, sent_keys=sent_keys)
+                self.stdout.write(f"  Overdue digest: {len(overdue)} borrow(s) to {overdue_count} admin(s)")
 
+        self.dispatcher = dispatcher
+        self.stdout.write(
+            f"  Sent {dispatcher.sent}, failed {dispatcher.failed} in {dispatcher.elapsed:.1f}s "
+            f"({dispatcher.throughput:.1f} msg/s, {options['workers']} worker(s))"
+        )
         self.stdout.write(self.style.SUCCESS(
             f"\nDone: {reminder_count} reminder(s), {overdue_count} overdue alert(s), {fine_count} fine notification(s)"
         ))
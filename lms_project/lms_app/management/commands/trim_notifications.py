@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lms_app.notifications import MAX_NOTIFICATIONS, trim_notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete in-app notifications beyond each student's newest "
+        f"{MAX_NOTIFICATIONS}. Notifications are never trimmed on insert; run this periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=MAX_NOTIFICATIONS,
+                            help=f'Notifications to keep per student (default: {MAX_NOTIFICATIONS}).')
+
+    def handle(self, *args, **options):
+        if options['limit'] < 0:
+            raise CommandError('--limit cannot be negative.')
+        deleted = trim_notifications(options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"trim_notifications: deleted {deleted} notification(s)."))
@@ -1,10 +1,17 @@
-class NoCacheMiddleware:
+class CachePolicyMiddleware:
+    """
+    Default cache policy: responses that did not set Cache-Control (see
+    cache_policy.revalidate) are not stored, so pages behind a login are
+    never shown from the browser cache after logout.
+    """
+
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
         response = self.get_response(request)
-        response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response['Pragma'] = 'no-cache'
-        response['Expires'] = '0'
+        if not response.has_header('Cache-Control'):
+            response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+            response['Pragma'] = 'no-cache'
+            response['Expires'] = '0'
         return response
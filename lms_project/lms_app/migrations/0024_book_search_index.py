@@ -0,0 +1,95 @@
+from django.db import migrations, OperationalError
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE lms_app_book_fts USING fts5(
+        title, author, isbn,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO lms_app_book_fts (rowid, title, author, isbn)
+    SELECT id, title, author, replace(isbn, '-', '') FROM lms_app_book
+    """,
+    """
+    CREATE TRIGGER lms_app_book_fts_ai AFTER INSERT ON lms_app_book BEGIN
+        INSERT INTO lms_app_book_fts (rowid, title, author, isbn)
+        VALUES (new.id, new.title, new.author, replace(new.isbn, '-', ''));
+    END
+    """,
+    """
+    CREATE TRIGGER lms_app_book_fts_ad AFTER DELETE ON lms_app_book BEGIN
+        DELETE FROM lms_app_book_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER lms_app_book_fts_au AFTER UPDATE OF title, author, isbn ON lms_app_book BEGIN
+        DELETE FROM lms_app_book_fts WHERE rowid = old.id;
+        INSERT INTO lms_app_book_fts (rowid, title, author, isbn)
+        VALUES (new.id, new.title, new.author, replace(new.isbn, '-', ''));
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS lms_app_book_fts_au",
+    "DROP TRIGGER IF EXISTS lms_app_book_fts_ad",
+    "DROP TRIGGER IF EXISTS lms_app_book_fts_ai",
+    "DROP TABLE IF EXISTS lms_app_book_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE lms_app_book ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(author, '')), 'B') ||
+        setweight(to_tsvector('simple', replace(coalesce(isbn, ''), '-', '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX lms_app_book_search_vector_gin ON lms_app_book USING GIN (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS lms_app_book_search_vector_gin",
+    "ALTER TABLE lms_app_book DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        try:
+            _run(schema_editor, SQLITE_FORWARD[:1])
+        except OperationalError:
+            # SQLite built without FTS5; lms_app.search falls back to LIKE.
+            return
+        _run(schema_editor, SQLITE_FORWARD[1:])
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_app', '0023_notification'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:10
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Book = apps.get_model('lms_app', 'Book')
+    BookReview = apps.get_model('lms_app', 'BookReview')
+
+    def stat(aggregate, **filters):
+        sub = (
+            BookReview.objects.filter(book=OuterRef('pk'), **filters)
+            .order_by()
+            .values('book')
+            .annotate(value=aggregate)
+            .values('value')
+        )
+        return Coalesce(Subquery(sub, output_field=IntegerField()), Value(0))
+
+    Book.objects.update(
+        review_count=stat(Count('id')),
+        rating_sum=stat(Sum('rating')),
+        **{f'rating_{star}_count': stat(Count('id'), rating=star) for star in range(1, 6)},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_app', '0024_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
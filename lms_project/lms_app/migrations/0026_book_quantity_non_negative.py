@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:11
+
+from django.db import migrations, models
+
+
+def clamp_negative_stock(apps, schema_editor):
+    Book = apps.get_model('lms_app', 'Book')
+    Book.objects.filter(quantity__lt=0).update(quantity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_app', '0025_book_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_negative_stock, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity__gte', 0)), name='book_quantity_non_negative'),
+        ),
+    ]
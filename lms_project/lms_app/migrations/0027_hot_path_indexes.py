@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_app', '0026_book_quantity_non_negative'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['status', 'is_returned', 'expected_return_date'], name='borrow_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('is_returned', False), ('status', 'approved')), fields=['expected_return_date'], name='borrow_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('fine_amount__gt', 0)), fields=['fine_amount'], name='borrow_fined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['-borrow_date', '-id'], name='borrow_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emailnotificationlog',
+            index=models.Index(fields=['notification_type', 'borrow', 'recipient_email', 'sent_at'], name='emaillog_dedupe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['student', 'is_read', 'created_at'], name='notif_student_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['student', '-created_at'], name='notif_student_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['student'], name='notif_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:20
+
+from datetime import timedelta
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def backfill_fine_ledger(apps, schema_editor):
+    """
+    Open the ledger from current state: returned fines post as one return
+    entry, open overdue loans get an accrual for each overdue day so far
+    less their approved waivers.
+    """
+    Borrow = apps.get_model('lms_app', 'Borrow')
+    FineLedger = apps.get_model('lms_app', 'FineLedger')
+    Student = apps.get_model('lms_app', 'Student')
+    today = timezone.now().date()
+
+    entries = [
+        FineLedger(
+            borrow_id=b.id, student_id=b.student_id, entry_type='return',
+            amount=b.fine_amount, entry_date=b.return_date or today,
+        )
+        for b in Borrow.objects.filter(is_returned=True, fine_amount__gt=0).only(
+            'id', 'student_id', 'fine_amount', 'return_date',
+        ).iterator()
+    ]
+    overdue = Borrow.objects.filter(
+        status='approved', is_returned=False, expected_return_date__lt=today,
+    ).select_related('book').annotate(
+        waived=Sum('waivers__waived_amount', filter=models.Q(waivers__status='approved')),
+    )
+    for b in overdue.iterator():
+        day = b.expected_return_date + timedelta(days=1)
+        accrued = Decimal('0.00')
+        while day <= today:
+            entries.append(FineLedger(
+                borrow_id=b.id, student_id=b.student_id, entry_type='accrual',
+                amount=b.book.fine_rate, entry_date=day,
+            ))
+            accrued += b.book.fine_rate
+            day += timedelta(days=1)
+        if b.waived:
+            entries.append(FineLedger(
+                borrow_id=b.id, student_id=b.student_id, entry_type='waiver',
+                amount=-min(b.waived, accrued), entry_date=today,
+            ))
+    FineLedger.objects.bulk_create(entries, batch_size=1000)
+
+    money = DecimalField(max_digits=10, decimal_places=2)
+    totals = (
+        FineLedger.objects.filter(student=OuterRef('pk'))
+        .order_by()
+        .values('student')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    Student.objects.update(
+        fine_balance=Coalesce(Subquery(totals, output_field=money), Value(Decimal('0.00'), output_field=money)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_app', '0027_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='fine_balance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='FineLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('accrual', 'Daily Accrual'), ('waiver', 'Waiver'), ('return', 'Return Adjustment')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('entry_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('borrow', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='lms_app.borrow')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='lms_app.student')),
+            ],
+            options={
+                'ordering': ['-entry_date', '-id'],
+                'indexes': [models.Index(fields=['student', 'entry_date'], name='fineledger_student_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('entry_type', 'accrual')), fields=('borrow', 'entry_date'), name='fineledger_one_accrual_per_day')],
+            },
+        ),
+        migrations.RunPython(backfill_fine_ledger, migrations.RunPython.noop),
+    ]
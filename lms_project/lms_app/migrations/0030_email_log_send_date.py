@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:26
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Min
+from django.db.models.functions import TruncDate
+
+DAILY_NOTIFICATION_TYPES = ('reminder_7day', 'reminder_2day', 'reminder_1day', 'overdue_admin', 'fine_daily')
+
+
+def backfill_send_date(apps, schema_editor):
+    """
+    Date every existing log row from sent_at. Where past races left several
+    successful sends for one daily key, only the first is dated so the new
+    unique constraint holds; the extras keep a NULL send_date.
+    """
+    EmailNotificationLog = apps.get_model('lms_app', 'EmailNotificationLog')
+    daily = models.Q(success=True, notification_type__in=DAILY_NOTIFICATION_TYPES)
+
+    EmailNotificationLog.objects.exclude(daily).update(send_date=TruncDate('sent_at'))
+    first_ids = (
+        EmailNotificationLog.objects.filter(daily)
+        .annotate(day=TruncDate('sent_at'))
+        .order_by()
+        .values('notification_type', 'borrow', 'recipient_email', 'day')
+        .annotate(first_id=Min('id'))
+        .values('first_id')
+    )
+    EmailNotificationLog.objects.filter(id__in=list(first_ids)).update(send_date=TruncDate('sent_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_app', '0029_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailnotificationlog',
+            name='send_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_send_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='emailnotificationlog',
+            name='send_date',
+            field=models.DateField(blank=True, default=django.utils.timezone.localdate, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='emailnotificationlog',
+            constraint=models.UniqueConstraint(condition=models.Q(('notification_type__in', ('reminder_7day', 'reminder_2day', 'reminder_1day', 'overdue_admin', 'fine_daily')), ('success', True)), fields=('notification_type', 'borrow', 'recipient_email', 'send_date'), name='emaillog_once_per_day'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_app', '0031_scan_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='borrow',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='in_app_notifications', to='lms_app.borrow'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(blank=True, choices=[('', 'General'), ('due_reminder', 'Due Date Reminder')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='send_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('send_date__isnull', False)), fields=('kind', 'borrow', 'send_date'), name='notif_once_per_day'),
+        ),
+    ]
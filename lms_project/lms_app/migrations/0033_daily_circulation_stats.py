@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:21
+
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_circulation_stats(apps, schema_editor):
+    # Same rollup as lms_app.circulation.rebuild(), written against the
+    # historical models so later schema changes cannot break this step.
+    # Without it the report shows nothing for history until someone runs
+    # `manage.py backfill_circulation_stats`.
+    Borrow = apps.get_model('lms_app', 'Borrow')
+    DailyCirculationStats = apps.get_model('lms_app', 'DailyCirculationStats')
+    sources = (
+        ('borrows', 'borrow_date', Borrow.objects.all()),
+        ('rejections', 'borrow_date', Borrow.objects.filter(status='rejected')),
+        ('returns', 'return_date', Borrow.objects.filter(is_returned=True, return_date__isnull=False)),
+    )
+    counts = defaultdict(Counter)
+    for field, date_field, borrows in sources:
+        rows = borrows.order_by().values(date_field, 'book_id').annotate(n=models.Count('id'))
+        for row in rows:
+            if row[date_field] is not None:
+                counts[row[date_field], row['book_id']][field] = row['n']
+    DailyCirculationStats.objects.bulk_create(
+        [
+            DailyCirculationStats(date=day, book_id=book_id, **fields)
+            for (day, book_id), fields in counts.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_app', '0032_notification_dedupe_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCirculationStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('borrows', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+                ('rejections', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='lms_app.book')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'book'), name='circulation_one_row_per_day')],
+            },
+        ),
+        migrations.RunPython(backfill_circulation_stats, migrations.RunPython.noop),
+    ]
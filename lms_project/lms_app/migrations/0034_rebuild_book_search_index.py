@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+from django.db import migrations
+
+# 0025 and 0026 rebuilt lms_app_book, which dropped the FTS triggers
+# created in 0024, so books added since then were never indexed. The SQL
+# is copied here rather than imported from lms_app.search so this
+# migration keeps doing the same thing whatever that module becomes.
+SQLITE_FORWARD = [
+    "DROP TRIGGER IF EXISTS lms_app_book_fts_ai",
+    "DROP TRIGGER IF EXISTS lms_app_book_fts_ad",
+    "DROP TRIGGER IF EXISTS lms_app_book_fts_au",
+    """
+    CREATE TRIGGER lms_app_book_fts_ai AFTER INSERT ON lms_app_book BEGIN
+        INSERT INTO lms_app_book_fts (rowid, title, author, isbn)
+        VALUES (new.id, new.title, new.author, replace(new.isbn, '-', ''));
+    END
+    """,
+    """
+    CREATE TRIGGER lms_app_book_fts_ad AFTER DELETE ON lms_app_book BEGIN
+        DELETE FROM lms_app_book_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER lms_app_book_fts_au AFTER UPDATE OF title, author, isbn ON lms_app_book BEGIN
+        DELETE FROM lms_app_book_fts WHERE rowid = old.id;
+        INSERT INTO lms_app_book_fts (rowid, title, author, isbn)
+        VALUES (new.id, new.title, new.author, replace(new.isbn, '-', ''));
+    END
+    """,
+    "DELETE FROM lms_app_book_fts",
+    """
+    INSERT INTO lms_app_book_fts (rowid, title, author, isbn)
+    SELECT id, title, author, replace(isbn, '-', '') FROM lms_app_book
+    """,
+]
+
+
+def rebuild_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    if 'lms_app_book_fts' not in connection.introspection.table_names():
+        # SQLite built without FTS5; 0024 skipped the index.
+        return
+    for sql in SQLITE_FORWARD:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_app', '0033_daily_circulation_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
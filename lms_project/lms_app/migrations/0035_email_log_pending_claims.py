@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_app', '0034_rebuild_book_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='emailnotificationlog',
+            name='emaillog_once_per_day',
+        ),
+        migrations.RemoveIndex(
+            model_name='emailnotificationlog',
+            name='emaillog_dedupe_idx',
+        ),
+        migrations.AlterField(
+            model_name='emailnotificationlog',
+            name='success',
+            field=models.BooleanField(default=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='emailnotificationlog',
+            index=models.Index(fields=['notification_type', 'borrow', 'recipient_email', 'send_date'], name='emaillog_dedupe_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='emailnotificationlog',
+            constraint=models.UniqueConstraint(condition=models.Q(('notification_type__in', ('reminder_7day', 'reminder_2day', 'reminder_1day', 'overdue_admin', 'fine_daily')), models.Q(('success', True), ('success__isnull', True), _connector='OR')), fields=('notification_type', 'borrow', 'recipient_email', 'send_date'), name='emaillog_once_per_day'),
+        ),
+    ]
@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.contrib.auth.hashers import make_password, check_password
 
+from .live import STOCK, changed
+
 ROLE_CHOICES = (
     ('officer', 'Admin Officer'),
     ('superadmin', 'Superadmin'),
@@ -35,10 +39,96 @@ class Book(models.Model):
     department = models.CharField(max_length=100, default='dummy')
     language = models.CharField(max_length=50, default='English')
     fine_rate = models.DecimalField(max_digits=10, decimal_places=2, default=5.00, help_text='Fine per day in rupees (₹)')
+    # Denormalised review aggregates, maintained by Book.apply_rating_change()
+    # and rebuilt by the rebuild_book_ratings management command.
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(quantity__gte=0), name='book_quantity_non_negative'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def take_copy(cls, book_id):
+        """
+        Atomically reserve one copy. The decrement is a conditional UPDATE, so
+        two concurrent approvals can never both take the last copy. Returns
+        False when the book is out of stock.
+        """
+        taken = cls.objects.filter(pk=book_id, quantity__gt=0).update(quantity=F('quantity') - 1) == 1
+        if taken:
+            changed(STOCK)
+        return taken
+
+    @classmethod
+    def take_copies(cls, book_id, count):
+        """
+        Reserve up to ``count`` copies in one guarded UPDATE and return how
+        many were actually taken (fewer when stock runs short).
+        """
+        while count > 0:
+            available = cls.objects.filter(pk=book_id).values_list('quantity', flat=True).first() or 0
+            taken = min(count, available)
+            if taken <= 0:
+                return 0
+            updated = cls.objects.filter(pk=book_id, quantity__gte=taken).update(quantity=F('quantity') - taken)
+            if updated:
+                changed(STOCK)
+                return taken
+        return 0
+
+    @classmethod
+    def return_copy(cls, book_id, count=1):
+        cls.objects.filter(pk=book_id).update(quantity=F('quantity') + count)
+        changed(STOCK)
+
+    @property
+    def avg_rating(self):
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
+    @property
+    def rating_histogram(self):
+        return {
+            star: getattr(self, f'rating_{star}_count')
+            for star in range(1, 6)
+        }
+
+    @classmethod
+    def apply_rating_change(cls, book_id, old_rating=None, new_rating=None):
+        """
+        Shift a book's rating aggregates for one review being created
+        (old_rating=None), re-rated, or deleted (new_rating=None). Runs as a
+        single UPDATE with F() expressions so concurrent reviews never lose
+        increments.
+        """
+        if old_rating == new_rating:
+            return
+        changes = {}
+        if old_rating is None:
+            changes['review_count'] = F('review_count') + 1
+        elif new_rating is None:
+            changes['review_count'] = F('review_count') - 1
+        changes['rating_sum'] = F('rating_sum') + (new_rating or 0) - (old_rating or 0)
+        if old_rating is not None:
+            field = f'rating_{old_rating}_count'
+            changes[field] = F(field) - 1
+        if new_rating is not None:
+            field = f'rating_{new_rating}_count'
+            changes[field] = F(field) + 1
+        cls.objects.filter(pk=book_id).update(**changes)
+        changed(STOCK)
+
 STUDENT_STATUS_CHOICES = (
     ('pending', 'Pending Approval'),
     ('approved', 'Approved'),
@@ -54,6 +144,8 @@ class Student(models.Model):
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     status = models.CharField(max_length=20, choices=STUDENT_STATUS_CHOICES, default='pending')
     status_reason = models.TextField(blank=True, null=True, help_text='Reason for rejection or disabling')
+    # Running total of this student's FineLedger entries.
+    fine_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
     def __str__(self):
         return self.roll_no
@@ -79,15 +171,29 @@ class Borrow(models.Model):
     fine_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     reject_reason = models.TextField(blank=True, null=True, help_text='Reason for rejection')
 
+    class Meta:
+        indexes = [
+            # Scheduled reminders, overdue alerts and the fines views.
+            models.Index(fields=['status', 'is_returned', 'expected_return_date'], name='borrow_status_due_idx'),
+            models.Index(
+                fields=['expected_return_date'],
+                condition=models.Q(status='approved', is_returned=False),
+                name='borrow_open_due_idx',
+            ),
+            models.Index(fields=['fine_amount'], condition=models.Q(fine_amount__gt=0), name='borrow_fined_idx'),
+            # Newest-first keyset pagination of the borrow requests page.
+            models.Index(fields=['-borrow_date', '-id'], name='borrow_recent_idx'),
+        ]
+
     def __str__(self):
         return f"{self.student} - {self.book} ({self.status})"
     
     def calculate_fine(self):
         """Calculate fine if book is overdue, accounting for approved waivers"""
         if self.expected_return_date and not self.is_returned:
-            from datetime import date
             from decimal import Decimal
-            today = date.today()
+            # Same calendar day as fines.annotate_live_fines().
+            today = timezone.localdate()
             if today > self.expected_return_date:
                 overdue_days = (today - self.expected_return_date).days
                 gross_fine = Decimal(overdue_days) * self.book.fine_rate
@@ -99,6 +205,30 @@ class Borrow(models.Model):
         return Decimal('0.00')
 
 
+class DailyCirculationStats(models.Model):
+    """
+    Per-day, per-book circulation counts for the admin dashboard charts,
+    kept up to date by lms_app.circulation as borrows change and rebuilt
+    from Borrow with ``manage.py backfill_circulation_stats``.
+
+    ``borrows`` and ``rejections`` count requests by their borrow_date;
+    ``returns`` count returned loans by their return_date.
+    """
+    date = models.DateField()
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='daily_stats')
+    borrows = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+    rejections = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'book'], name='circulation_one_row_per_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} on {self.date}: {self.borrows} borrowed, {self.returns} returned"
+
+
 NOTIFICATION_TYPE_CHOICES = (
     ('borrow_confirmed', 'Borrow Confirmed'),
     ('reminder_7day', '7-Day Return Reminder'),
@@ -112,21 +242,101 @@ NOTIFICATION_TYPE_CHOICES = (
     ('signup_rejected', 'Signup Rejected'),
 )
 
+# Scheduled notifications that go out at most once per day per
+# (type, borrow, recipient).
+DAILY_NOTIFICATION_TYPES = ('reminder_7day', 'reminder_2day', 'reminder_1day', 'overdue_admin', 'fine_daily')
+
 class EmailNotificationLog(models.Model):
     notification_type = models.CharField(max_length=30, choices=NOTIFICATION_TYPE_CHOICES)
     recipient_email = models.EmailField()
     borrow = models.ForeignKey(Borrow, on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
     subject = models.CharField(max_length=255)
     sent_at = models.DateTimeField(auto_now_add=True)
-    success = models.BooleanField(default=True)
+    # Calendar day of the send; part of the once-a-day key for scheduled types.
+    send_date = models.DateField(default=timezone.localdate, null=True, blank=True)
+    # None while a scheduled send is claimed but not yet attempted.
+    success = models.BooleanField(default=True, null=True)
 
     class Meta:
         ordering = ['-sent_at']
+        constraints = [
+            # Pending claims count too, so a concurrent run cannot claim the
+            # same send; stale ones are released to success=False.
+            models.UniqueConstraint(
+                fields=['notification_type', 'borrow', 'recipient_email', 'send_date'],
+                condition=(
+                    models.Q(notification_type__in=DAILY_NOTIFICATION_TYPES)
+                    & (models.Q(success=True) | models.Q(success__isnull=True))
+                ),
+                name='emaillog_once_per_day',
+            ),
+        ]
+        indexes = [
+            # Duplicate-send checks in notifications._already_sent_today()
+            # and sent_today_keys().
+            models.Index(
+                fields=['notification_type', 'borrow', 'recipient_email', 'send_date'],
+                name='emaillog_dedupe_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.notification_type} to {self.recipient_email} at {self.sent_at}"
 
 
+OUTBOX_STATUS_CHOICES = (
+    ('pending', 'Pending'),
+    ('sent', 'Sent'),
+    ('failed', 'Failed'),
+)
+
+class EmailOutbox(models.Model):
+    """
+    Mail written in the same transaction as the change that triggers it and
+    delivered later by ``run_email_worker``, so requests never wait on SMTP.
+    """
+    notification_type = models.CharField(max_length=30, choices=NOTIFICATION_TYPE_CHOICES)
+    recipient_email = models.EmailField()
+    borrow = models.ForeignKey(Borrow, on_delete=models.SET_NULL, null=True, blank=True, related_name='outbox_emails')
+    subject = models.CharField(max_length=255)
+    body_text = models.TextField()
+    body_html = models.TextField()
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Earliest time a worker may pick the row up: pushed out while a worker
+    # holds it and for retry backoff after a failed attempt.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'), name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.notification_type} to {self.recipient_email} ({self.status})"
+
+
+class ScanCheckpoint(models.Model):
+    """
+    How far a scheduled command got through today's scan, so a run that
+    stops part-way can be restarted with ``--resume`` instead of rescanning.
+    """
+    job = models.CharField(max_length=100, unique=True)
+    run_date = models.DateField()
+    # Highest primary key fully processed; the scan resumes after it.
+    last_pk = models.BigIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        state = 'finished' if self.finished else f'at pk {self.last_pk}'
+        return f"{self.job} {self.run_date} ({state})"
+
+
 WAIVER_STATUS_CHOICES = (
     ('pending', 'Pending Approval'),
     ('approved', 'Approved'),
@@ -149,6 +359,39 @@ class FineWaiver(models.Model):
         return f"Waiver for {self.borrow} - {self.status}"
 
 
+LEDGER_ENTRY_CHOICES = (
+    ('accrual', 'Daily Accrual'),
+    ('waiver', 'Waiver'),
+    ('return', 'Return Adjustment'),
+)
+
+class FineLedger(models.Model):
+    borrow = models.ForeignKey(Borrow, on_delete=models.CASCADE, related_name='ledger_entries')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='ledger_entries')
+    entry_type = models.CharField(max_length=10, choices=LEDGER_ENTRY_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    entry_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-entry_date', '-id']
+        constraints = [
+            # A borrow accrues at most once per day, so re-running the
+            # nightly job is a no-op.
+            models.UniqueConstraint(
+                fields=['borrow', 'entry_date'],
+                condition=models.Q(entry_type='accrual'),
+                name='fineledger_one_accrual_per_day',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['student', 'entry_date'], name='fineledger_student_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_type} {self.amount} for {self.borrow_id} on {self.entry_date}"
+
+
 class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     content = models.TextField(max_length=500)
@@ -194,15 +437,38 @@ class Comment(models.Model):
         return f"{self.user.username} on {self.post.id}: {self.content[:30]}"
 
 
+NOTIFICATION_KIND_CHOICES = (
+    ('', 'General'),
+    ('due_reminder', 'Due Date Reminder'),
+)
+
 class Notification(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='in_app_notifications')
     message = models.CharField(max_length=300)
     link = models.CharField(max_length=200, blank=True)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set for generated notifications (reminders) so duplicates are caught
+    # by notif_once_per_day rather than by matching message text.
+    kind = models.CharField(max_length=20, choices=NOTIFICATION_KIND_CHOICES, blank=True, default='')
+    borrow = models.ForeignKey(Borrow, on_delete=models.CASCADE, null=True, blank=True, related_name='in_app_notifications')
+    send_date = models.DateField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'borrow', 'send_date'],
+                condition=models.Q(send_date__isnull=False),
+                name='notif_once_per_day',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['student', 'is_read', 'created_at'], name='notif_student_read_idx'),
+            # Latest-N dropdown and the notifications page.
+            models.Index(fields=['student', '-created_at'], name='notif_student_recent_idx'),
+            models.Index(fields=['student'], condition=models.Q(is_read=False), name='notif_unread_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.roll_no}: {self.message[:50]}"
@@ -1,65 +1,403 @@
 import logging
-from datetime import date
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
 from django.conf import settings
-from .models import Admin, EmailNotificationLog
+from .counters import notifications_changed
+from .email_rendering import active_admin_emails, render_email
+from .models import DAILY_NOTIFICATION_TYPES, EmailNotificationLog, EmailOutbox, Notification
 
 logger = logging.getLogger(__name__)
 
-
-def _send_email(subject, template_name, context, recipient_list, notification_type, borrow=None):
-    html_message = render_to_string(template_name, context)
-    plain_message = strip_tags(html_message)
-    all_succeeded = True
-
-    for recipient in recipient_list:
+_local = threading.local()
+
+# Failures that mean the SMTP session is gone rather than the message being
+# refused; these get one retry on a fresh connection.
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+# A daily send is claimed (success=None) before it goes out and settled
+# once the outcome is known. A claim still pending after this long belongs
+# to a run that died, and release_stale_claims() lets it be retried.
+PENDING_CLAIM_LEASE = timedelta(minutes=30)
+_CLAIMED = Q(success=True) | Q(success__isnull=True)
+
+
+class EmailBatch:
+    """
+    Send messages over one shared SMTP connection instead of a connect, TLS
+    handshake and login per message. The connection is recycled after
+    ``batch_size`` messages (relays cap messages per session) and re-opened
+    if it drops mid-run.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+        self.connection = None
+        self.sent_on_connection = 0
+
+    def _connect(self):
+        self.close()
+        self.connection = get_connection(fail_silently=False)
+        self.connection.open()
+        self.sent_on_connection = 0
+
+    def close(self):
+        if self.connection is None:
+            return
         try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[recipient],
-                html_message=html_message,
-                fail_silently=False,
-            )
-            EmailNotificationLog.objects.create(
-                notification_type=notification_type,
-                recipient_email=recipient,
-                borrow=borrow,
-                subject=subject,
-                success=True,
-            )
+            self.connection.close()
         except Exception as e:
-            logger.error(f"Failed to send email to {recipient}: {e}")
-            EmailNotificationLog.objects.create(
+            logger.warning(f"Error closing SMTP connection: {e}")
+        self.connection = None
+
+    def send(self, message):
+        for attempt in (1, 2):
+            if self.connection is None or self.sent_on_connection >= self.batch_size:
+                self._connect()
+            try:
+                self.connection.send_messages([message])
+            except _CONNECTION_ERRORS:
+                self.close()
+                if attempt == 2:
+                    raise
+                continue
+            self.sent_on_connection += 1
+            return
+
+    def send_all(self, messages):
+        """Send each message; return a success flag per message."""
+        results = []
+        for message in messages:
+            try:
+                self.send(message)
+                results.append(True)
+            except Exception as e:
+                logger.error(f"Failed to send email to {', '.join(message.to)}: {e}")
+                results.append(False)
+        return results
+
+
+@contextmanager
+def email_batch(batch_size=None):
+    """Route every notification sent inside the block over one SMTP connection."""
+    current = getattr(_local, 'batch', None)
+    if current is not None:
+        yield current
+        return
+    batch = EmailBatch(batch_size)
+    _local.batch = batch
+    try:
+        yield batch
+    finally:
+        _local.batch = None
+        batch.close()
+
+
+class RateLimiter:
+    """Space calls to wait() at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at = max(self.next_at, now)
+            self.next_at = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+class EmailDispatcher:
+    """
+    Send messages from a bounded pool of worker threads, each holding its own
+    SMTP connection, at no more than ``rate`` messages per second overall.
+
+    Workers only talk SMTP. Their outcomes come back on a queue and are
+    written to EmailNotificationLog by the thread that owns the dispatcher
+    (on each submit() and at close()), so the database has a single writer.
+    """
+
+    def __init__(self, workers=1, rate=None, batch_size=None):
+        self.rate_limiter = RateLimiter(rate)
+        self.batch_size = batch_size
+        # Bounded so claiming and rendering cannot run far ahead of the relay.
+        self.jobs = queue.Queue(maxsize=workers * 4)
+        self.results = queue.Queue()
+        self.threads = [
+            threading.Thread(target=self._work, name=f'email-worker-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        self.sent = 0
+        self.failed = 0
+        # Seconds each send took, rate-limit wait excluded.
+        self.latencies = []
+        self.started = None
+        self.elapsed = 0.0
+
+    def start(self):
+        self.started = time.monotonic()
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, message, log):
+        self.flush()
+        self.jobs.put((message, log))
+
+    def _work(self):
+        with email_batch(self.batch_size) as batch:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    self.jobs.task_done()
+                    return
+                message, log = job
+                self.rate_limiter.wait()
+                started = time.perf_counter()
+                success = batch.send_all([message])[0]
+                self.latencies.append(time.perf_counter() - started)
+                self.results.put((log, success))
+                self.jobs.task_done()
+
+    def drain(self):
+        """Wait until every submitted message is sent, then write the outcomes."""
+        self.jobs.join()
+        self.flush()
+
+    def flush(self):
+        """Write the outcomes workers have reported so far."""
+        outcomes = []
+        while True:
+            try:
+                outcomes.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        for _, success in outcomes:
+            if success:
+                self.sent += 1
+            else:
+                self.failed += 1
+        _record_outcomes(outcomes)
+
+    def close(self):
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.flush()
+        self.elapsed = time.monotonic() - self.started
+
+    @property
+    def throughput(self):
+        return (self.sent + self.failed) / self.elapsed if self.elapsed else 0.0
+
+
+@contextmanager
+def email_dispatcher(workers=1, rate=None, batch_size=None):
+    """
+    Hand every scheduled notification sent inside the block to an
+    EmailDispatcher; the senders return once their messages are queued.
+    Outcomes are all recorded by the time the block exits.
+    """
+    dispatcher = EmailDispatcher(workers, rate, batch_size)
+    dispatcher.start()
+    _local.dispatcher = dispatcher
+    try:
+        yield dispatcher
+    finally:
+        _local.dispatcher = None
+        dispatcher.close()
+
+
+def _build_message(subject, plain_message, html_message, recipient):
+    message = EmailMultiAlternatives(
+        subject=subject,
+        body=plain_message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient],
+    )
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
+def _claim_daily_sends(subject, recipient_list, notification_type, borrow):
+    """
+    Write today's log row for each recipient *before* sending, as a pending
+    claim (success=None) settled by _record_outcomes(). The
+    emaillog_once_per_day constraint rejects a second claim for the same
+    (type, borrow, recipient, day), so a re-run or a concurrent run skips
+    that recipient instead of mailing it twice. Returns {recipient: log id}.
+    """
+    claimed = _claim_daily(subject, notification_type, [(r, borrow) for r in recipient_list])
+    return {recipient: log_id for (recipient, _), log_id in claimed.items()}
+
+
+def _claim_daily(subject, notification_type, pairs):
+    """Claim (recipient, borrow) pairs; returns {(recipient, borrow_id): log id}."""
+    claimed = {}
+    for recipient, borrow in pairs:
+        try:
+            with transaction.atomic():
+                log = EmailNotificationLog.objects.create(
+                    notification_type=notification_type,
+                    recipient_email=recipient,
+                    borrow=borrow,
+                    subject=subject,
+                    success=None,
+                )
+        except IntegrityError:
+            continue
+        claimed[(recipient, borrow.id if borrow else None)] = log.id
+    return claimed
+
+
+def _send_email(subject, template_name, context, recipient_list, notification_type, borrow=None):
+    claimed = None
+    if notification_type in DAILY_NOTIFICATION_TYPES:
+        claimed = _claim_daily_sends(subject, recipient_list, notification_type, borrow)
+        if not claimed:
+            return False
+        recipient_list = list(claimed)
+
+    html_message, plain_message = render_email(template_name, context)
+    messages = [
+        _build_message(subject, plain_message, html_message, recipient)
+        for recipient in recipient_list
+    ]
+    if claimed is not None:
+        logs = [[claimed[recipient]] for recipient in recipient_list]
+    else:
+        logs = [
+            EmailNotificationLog(
                 notification_type=notification_type,
                 recipient_email=recipient,
                 borrow=borrow,
                 subject=subject,
-                success=False,
             )
-            all_succeeded = False
-
-    return all_succeeded
+            for recipient in recipient_list
+        ]
+    return _deliver(messages, logs)
+
+
+def _deliver(messages, logs):
+    """
+    Send ``messages`` and record each outcome against its entry in ``logs``:
+    a list of log ids claimed before sending, or an unsaved
+    EmailNotificationLog to create. Inside email_dispatcher() the messages
+    are handed to the worker pool instead and this returns True once they
+    are queued.
+    """
+    dispatcher = getattr(_local, 'dispatcher', None)
+    if dispatcher is not None:
+        for message, log in zip(messages, logs):
+            dispatcher.submit(message, log)
+        return True
+
+    with email_batch() as batch:
+        results = batch.send_all(messages)
+    _record_outcomes(zip(logs, results))
+    return all(results)
+
+
+def _record_outcomes(outcomes):
+    sent_ids, failed_ids, new_logs = [], [], []
+    for log, success in outcomes:
+        if isinstance(log, EmailNotificationLog):
+            log.success = success
+            new_logs.append(log)
+        else:
+            (sent_ids if success else failed_ids).extend(log)
+    if sent_ids:
+        EmailNotificationLog.objects.filter(id__in=sent_ids).update(success=True)
+    # Failed sends release their claim so a later run can retry them.
+    if failed_ids:
+        EmailNotificationLog.objects.filter(id__in=failed_ids).update(success=False)
+    if new_logs:
+        EmailNotificationLog.objects.bulk_create(new_logs)
+
+
+def _queue_email(subject, template_name, context, recipient_list, notification_type, borrow=None):
+    """
+    Write the email to EmailOutbox instead of sending it. Called inside the
+    caller's transaction, the mail exists only if the change commits, and
+    run_email_worker delivers it outside the request.
+    """
+    html_message, plain_message = render_email(template_name, context)
+    EmailOutbox.objects.bulk_create([
+        EmailOutbox(
+            notification_type=notification_type,
+            recipient_email=recipient,
+            borrow=borrow,
+            subject=subject,
+            body_text=plain_message,
+            body_html=html_message,
+        )
+        for recipient in recipient_list
+    ])
+    return True
+
+
+def release_stale_claims(lease=PENDING_CLAIM_LEASE):
+    """
+    Mark today's claims that are still pending after ``lease`` as failed, so
+    their recipients are mailed again. Those claims belong to a run that was
+    killed between claiming and recording the send. A caller that knows that
+    run is dead (``send_notifications --resume``) passes ``timedelta(0)``.
+    Returns the number released.
+    """
+    return EmailNotificationLog.objects.filter(
+        notification_type__in=DAILY_NOTIFICATION_TYPES,
+        send_date=timezone.localdate(),
+        success__isnull=True,
+        sent_at__lt=timezone.now() - lease,
+    ).update(success=False)
 
 
 def _already_sent_today(notification_type, borrow, recipient_email=None):
-    from django.utils import timezone
-    today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
     qs = EmailNotificationLog.objects.filter(
+        _CLAIMED,
         notification_type=notification_type,
         borrow=borrow,
-        sent_at__gte=today_start,
-        success=True,
+        send_date=timezone.localdate(),
     )
     if recipient_email:
         qs = qs.filter(recipient_email=recipient_email)
     return qs.exists()
 
 
-def send_borrow_confirmation(borrow):
+def sent_today_keys():
+    """
+    Today's successful or still-pending scheduled sends as a set of
+    (notification_type, borrow_id, recipient_email), fetched in one query so
+    a send_notifications run can skip duplicates without a query per check.
+    """
+    return set(
+        EmailNotificationLog.objects.filter(
+            _CLAIMED,
+            send_date=timezone.localdate(),
+            notification_type__in=DAILY_NOTIFICATION_TYPES,
+        ).values_list('notification_type', 'borrow_id', 'recipient_email')
+    )
+
+
+def _was_sent(notification_type, borrow, recipient_email, sent_keys):
+    if sent_keys is None:
+        return _already_sent_today(notification_type, borrow, recipient_email)
+    return (notification_type, borrow.id, recipient_email) in sent_keys
+
+
+def send_borrow_confirmation(borrow, admin_emails=None):
     student_email = borrow.student.user.email
     student_name = borrow.student.name or borrow.student.roll_no
     book_title = borrow.book.title
@@ -73,7 +411,7 @@ def send_borrow_confirmation(borrow):
         'expected_return_date': expected_return,
     }
 
-    _send_email(
+    _queue_email(
         subject=f"Book Borrowed: {book_title}",
         template_name='emails/borrow_confirmation.html',
         context=context,
@@ -82,11 +420,12 @@ def send_borrow_confirmation(borrow):
         borrow=borrow,
     )
 
-    admin_emails = list(Admin.objects.filter(is_active=True).values_list('email', flat=True))
+    if admin_emails is None:
+        admin_emails = active_admin_emails()
     if admin_emails:
         context['is_admin'] = True
         context['student_roll'] = borrow.student.roll_no
-        _send_email(
+        _queue_email(
             subject=f"Book Issued: {book_title} to {borrow.student.roll_no}",
             template_name='emails/borrow_confirmation.html',
             context=context,
@@ -96,7 +435,13 @@ def send_borrow_confirmation(borrow):
         )
 
 
-def send_return_reminder(borrow, days_remaining):
+def send_borrow_confirmations(borrows):
+    admin_emails = active_admin_emails()
+    for borrow in borrows:
+        send_borrow_confirmation(borrow, admin_emails=admin_emails)
+
+
+def send_return_reminder(borrow, days_remaining, sent_keys=None):
     if days_remaining == 7:
         notif_type = 'reminder_7day'
     elif days_remaining == 2:
@@ -107,7 +452,7 @@ def send_return_reminder(borrow, days_remaining):
         return False
 
     student_email = borrow.student.user.email
-    if _already_sent_today(notif_type, borrow, student_email):
+    if _was_sent(notif_type, borrow, student_email, sent_keys):
         return False
 
     student_name = borrow.student.name or borrow.student.roll_no
@@ -129,48 +474,74 @@ def send_return_reminder(borrow, days_remaining):
     )
 
 
-def send_overdue_admin_alert(borrow):
-    admin_emails = list(Admin.objects.filter(is_active=True).values_list('email', flat=True))
+def send_overdue_admin_alert(borrow, admin_emails=None, sent_keys=None):
+    if admin_emails is None:
+        admin_emails = active_admin_emails()
+    admin_emails = [
+        email for email in admin_emails
+        if not _was_sent('overdue_admin', borrow, email, sent_keys)
+    ]
     if not admin_emails:
         return False
 
-    sent_any = False
+    overdue_days = (timezone.localdate() - borrow.expected_return_date).days
+    fine = borrow.calculate_fine()
+    student_name = borrow.student.name or borrow.student.roll_no
+    context = {
+        'student_name': student_name,
+        'student_roll': borrow.student.roll_no,
+        'book_title': borrow.book.title,
+        'expected_return_date': borrow.expected_return_date,
+        'overdue_days': overdue_days,
+        'fine_amount': fine,
+        'fine_rate': borrow.book.fine_rate,
+    }
+
+    return _send_email(
+        subject=f"Overdue Book Alert: {borrow.book.title} - {borrow.student.roll_no}",
+        template_name='emails/overdue_admin.html',
+        context=context,
+        recipient_list=admin_emails,
+        notification_type='overdue_admin',
+        borrow=borrow,
+    )
+
+
+def send_overdue_admin_digest(borrows, admin_emails, sent_keys=None):
+    """
+    Send each admin one email listing every overdue borrow they have not
+    been alerted about today. ``borrows`` comes from annotate_live_fines(),
+    already ordered by fine. Each listed borrow still gets its own
+    'overdue_admin' log row per admin, so history and the once-a-day key
+    match per-borrow mode. Returns the number of digests sent.
+    """
+    subject = f"Overdue Books Digest - {date.today():%d %b %Y}"
+    sent = 0
     for email in admin_emails:
-        if _already_sent_today('overdue_admin', borrow, email):
+        pending = [b for b in borrows if not _was_sent('overdue_admin', b, email, sent_keys)]
+        if not pending:
+            continue
+        claimed = _claim_daily(subject, 'overdue_admin', [(email, b) for b in pending])
+        pending = [b for b in pending if (email, b.id) in claimed]
+        if not pending:
             continue
 
-        overdue_days = (date.today() - borrow.expected_return_date).days
-        fine = borrow.calculate_fine()
-        student_name = borrow.student.name or borrow.student.roll_no
-        context = {
-            'student_name': student_name,
-            'student_roll': borrow.student.roll_no,
-            'book_title': borrow.book.title,
-            'expected_return_date': borrow.expected_return_date,
-            'overdue_days': overdue_days,
-            'fine_amount': fine,
-            'fine_rate': borrow.book.fine_rate,
-        }
-
-        result = _send_email(
-            subject=f"Overdue Book Alert: {borrow.book.title} - {borrow.student.roll_no}",
-            template_name='emails/overdue_admin.html',
-            context=context,
-            recipient_list=[email],
-            notification_type='overdue_admin',
-            borrow=borrow,
-        )
-        if result:
-            sent_any = True
-    return sent_any
+        html_message, plain_message = render_email('emails/overdue_admin_digest.html', {
+            'borrows': pending,
+            'total_fine': sum(b.live_fine for b in pending),
+        })
+        message = _build_message(subject, plain_message, html_message, email)
+        if _deliver([message], [list(claimed.values())]):
+            sent += 1
+    return sent
 
 
-def send_daily_fine_notification(borrow):
+def send_daily_fine_notification(borrow, sent_keys=None):
     student_email = borrow.student.user.email
-    if _already_sent_today('fine_daily', borrow, student_email):
+    if _was_sent('fine_daily', borrow, student_email, sent_keys):
         return False
 
-    overdue_days = (date.today() - borrow.expected_return_date).days
+    overdue_days = (timezone.localdate() - borrow.expected_return_date).days
     fine = borrow.calculate_fine()
     student_name = borrow.student.name or borrow.student.roll_no
 
@@ -206,7 +577,7 @@ def send_fine_waiver_notification(borrow, waived_amount, original_fine, new_fine
         'new_fine': new_fine,
     }
 
-    _send_email(
+    _queue_email(
         subject=f"Fine Waiver Approved: {borrow.book.title}",
         template_name='emails/fine_waived.html',
         context=context,
@@ -229,7 +600,7 @@ def send_signup_received_notification(student):
         'email': student_email,
     }
 
-    return _send_email(
+    return _queue_email(
         subject="Signup Request Received - Awaiting Approval",
         template_name='emails/signup_received.html',
         context=context,
@@ -250,7 +621,7 @@ def send_signup_approved_notification(student):
         'branch': student.branch,
     }
 
-    return _send_email(
+    return _queue_email(
         subject="Account Approved - You Can Now Log In!",
         template_name='emails/signup_approved.html',
         context=context,
@@ -272,10 +643,93 @@ def send_signup_rejected_notification(student, reject_reason):
         'reject_reason': reject_reason,
     }
 
-    return _send_email(
+    return _queue_email(
         subject="Signup Request Rejected",
         template_name='emails/signup_rejected.html',
         context=context,
         recipient_list=[student_email],
         notification_type='signup_rejected',
     )
+
+
+# Notifications kept per student. Inserts never trim; the periodic
+# trim_notifications command deletes everything older than each student's
+# newest MAX_NOTIFICATIONS, so a student may briefly hold a few more.
+MAX_NOTIFICATIONS = 50
+
+
+def create_notification(student, message, link=''):
+    try:
+        Notification.objects.create(student=student, message=message, link=link)
+        notifications_changed([student.id])
+    except Exception as exc:
+        logger.error(
+            "create_notification failed for student %s: %s",
+            getattr(student, 'roll_no', student),
+            exc,
+            exc_info=True,
+        )
+
+
+def create_notifications_bulk(items):
+    """Insert many ``(student, message, link)`` notifications with one bulk_create."""
+    if not items:
+        return
+    try:
+        Notification.objects.bulk_create([
+            Notification(student=student, message=message, link=link)
+            for student, message, link in items
+        ])
+        notifications_changed(student.id for student, _, _ in items)
+    except Exception as exc:
+        logger.error("create_notifications_bulk failed: %s", exc, exc_info=True)
+
+
+def broadcast_notification(student_ids, message, link=''):
+    """
+    Send one message to every student in ``student_ids`` with a single
+    bulk_create. Pass ids (e.g. ``values_list('id', flat=True)``) so
+    thousands of recipients never load a Student row.
+    """
+    student_ids = list(student_ids)
+    try:
+        Notification.objects.bulk_create([
+            Notification(student_id=student_id, message=message, link=link)
+            for student_id in student_ids
+        ])
+        notifications_changed(student_ids)
+    except Exception as exc:
+        logger.error("broadcast_notification failed: %s", exc, exc_info=True)
+
+
+def trim_notifications(limit=MAX_NOTIFICATIONS, chunk_size=500):
+    """
+    Delete each student's notifications beyond their newest ``limit``.
+    Only students over the limit are visited, ``chunk_size`` at a time.
+    Returns the number of rows deleted.
+    """
+    from django.db.models import Count, F, Window
+    from django.db.models.functions import RowNumber
+    over_limit = list(
+        Notification.objects.values('student_id')
+        .annotate(total=Count('id'))
+        .filter(total__gt=limit)
+        .values_list('student_id', flat=True)
+    )
+    deleted = 0
+    for start in range(0, len(over_limit), chunk_size):
+        old_ids = list(
+            Notification.objects.filter(student_id__in=over_limit[start:start + chunk_size])
+            .annotate(position=Window(
+                RowNumber(),
+                partition_by=[F('student_id')],
+                order_by=[F('created_at').desc(), F('id').desc()],
+            ))
+            .filter(position__gt=limit)
+            .values_list('id', flat=True)
+        )
+        for i in range(0, len(old_ids), chunk_size):
+            deleted += Notification.objects.filter(id__in=old_ids[i:i + chunk_size]).delete()[0]
+    if deleted:
+        notifications_changed(over_limit)
+    return deleted
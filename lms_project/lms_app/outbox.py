@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EmailNotificationLog, EmailOutbox
+from .notifications import _build_message
+
+# How long a claimed row stays invisible to other workers; a worker that
+# dies mid-batch releases its rows when this runs out.
+CLAIM_LEASE = timedelta(minutes=5)
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+
+
+def retry_delay(attempts):
+    """Exponential backoff: 30s, 1m, 2m, 4m, ... capped at an hour."""
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def claim_batch(limit):
+    """
+    Claim up to ``limit`` due outbox rows for this worker by pushing their
+    ``next_attempt_at`` out by the lease and counting the attempt.
+
+    PostgreSQL claims with SELECT ... FOR UPDATE SKIP LOCKED so concurrent
+    workers take disjoint rows without waiting. SQLite has no row locks, so
+    each row is claimed with a compare-and-set UPDATE on ``next_attempt_at``
+    and rows another worker got to first are dropped.
+    """
+    now = timezone.now()
+    due = EmailOutbox.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+    claim = {'next_attempt_at': now + CLAIM_LEASE, 'attempts': F('attempts') + 1}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            rows = list(due.select_for_update(skip_locked=True)[:limit])
+            EmailOutbox.objects.filter(id__in=[row.id for row in rows]).update(**claim)
+    else:
+        rows = [
+            row for row in due[:limit]
+            if EmailOutbox.objects.filter(
+                id=row.id, status='pending', next_attempt_at=row.next_attempt_at,
+            ).update(**claim)
+        ]
+
+    for row in rows:
+        row.attempts += 1
+    return rows
+
+
+def deliver(rows, batch, max_attempts):
+    """
+    Send claimed rows over ``batch`` (an EmailBatch) and record the outcome:
+    sent rows are closed, failed rows are rescheduled with backoff or marked
+    failed after ``max_attempts``. Every attempt is logged to
+    EmailNotificationLog. Returns ``(sent, failed)``.
+    """
+    sent, failed = [], []
+    for row in rows:
+        message = _build_message(row.subject, row.body_text, row.body_html, row.recipient_email)
+        try:
+            batch.send(message)
+        except Exception as e:
+            row.last_error = str(e)[:1000]
+            failed.append(row)
+        else:
+            sent.append(row)
+
+    now = timezone.now()
+    sent_ids = {row.id for row in sent}
+    for row in failed:
+        if row.attempts >= max_attempts:
+            row.status = 'failed'
+        else:
+            row.next_attempt_at = now + retry_delay(row.attempts)
+
+    with transaction.atomic():
+        EmailOutbox.objects.filter(id__in=sent_ids).update(
+            status='sent', sent_at=now, last_error='',
+        )
+        EmailOutbox.objects.bulk_update(failed, ['status', 'next_attempt_at', 'last_error'])
+        EmailNotificationLog.objects.bulk_create([
+            EmailNotificationLog(
+                notification_type=row.notification_type,
+                recipient_email=row.recipient_email,
+                borrow_id=row.borrow_id,
+                subject=row.subject,
+                success=row.id in sent_ids,
+            )
+            for row in rows
+        ])
+    return len(sent), len(failed)
@@ -0,0 +1,136 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'lms_app_book_fts'
+
+# Keep the FTS5 table in step with lms_app_book. SQLite drops these
+# whenever Django rebuilds the book table (most field or constraint
+# changes), so rebuild_sqlite_index() recreates them.
+SQLITE_TRIGGERS = {
+    'lms_app_book_fts_ai': f"""
+    CREATE TRIGGER lms_app_book_fts_ai AFTER INSERT ON lms_app_book BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, title, author, isbn)
+        VALUES (new.id, new.title, new.author, replace(new.isbn, '-', ''));
+    END
+    """,
+    'lms_app_book_fts_ad': f"""
+    CREATE TRIGGER lms_app_book_fts_ad AFTER DELETE ON lms_app_book BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    'lms_app_book_fts_au': f"""
+    CREATE TRIGGER lms_app_book_fts_au AFTER UPDATE OF title, author, isbn ON lms_app_book BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE} (rowid, title, author, isbn)
+        VALUES (new.id, new.title, new.author, replace(new.isbn, '-', ''));
+    END
+    """,
+}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_fts_available = None
+
+
+def _tokens(term):
+    # ISBNs are indexed without hyphens, so "978-0132350884" and
+    # "9780132350884" both reach the same token.
+    return _TOKEN_RE.findall(term.replace('-', '').lower())[:8]
+
+
+def _sqlite_fts_available():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available
+
+
+def rebuild_sqlite_index(conn):
+    """
+    Recreate the FTS5 triggers and reload the index from lms_app_book.
+    Does nothing if the FTS table is missing (SQLite without FTS5).
+    """
+    if FTS_TABLE not in conn.introspection.table_names():
+        return
+    with conn.cursor() as cursor:
+        for name, sql in SQLITE_TRIGGERS.items():
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(sql)
+        # A plain FTS5 table has no content table to 'rebuild' from, so
+        # reload it; ISBNs are stored without hyphens as in the triggers.
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, author, isbn) "
+            "SELECT id, title, author, replace(isbn, '-', '') FROM lms_app_book"
+        )
+
+
+def ensure_search_index(using='default', **kwargs):
+    """
+    post_migrate check: if any later migration rebuilt lms_app_book and
+    took the FTS triggers with it, put them back and reindex.
+    """
+    from django.db import connections
+    conn = connections[using]
+    if conn.vendor != 'sqlite' or FTS_TABLE not in conn.introspection.table_names():
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'lms_app_book'"
+        )
+        present = {row[0] for row in cursor.fetchall()}
+    if not present.issuperset(SQLITE_TRIGGERS):
+        rebuild_sqlite_index(conn)
+
+
+def search_books(books, term):
+    """
+    Restrict ``books`` to rows matching ``term`` and annotate ``search_rank``
+    (higher is better). Every token is matched as a prefix, so partial words
+    typed into the search box still hit.
+
+    Uses the FTS5 table on SQLite and the ``search_vector`` GIN index on
+    PostgreSQL; other backends fall back to a substring match ranked 0.
+    """
+    tokens = _tokens(term)
+    if not tokens:
+        return books.none()
+
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{t}:*' for t in tokens)
+        return books.filter(
+            RawSQL(
+                "lms_app_book.search_vector @@ to_tsquery('simple', %s)",
+                (tsquery,),
+                output_field=BooleanField(),
+            ),
+        ).annotate(
+            search_rank=RawSQL(
+                "ts_rank_cd(lms_app_book.search_vector, to_tsquery('simple', %s))",
+                (tsquery,),
+                output_field=FloatField(),
+            ),
+        )
+
+    if connection.vendor == 'sqlite' and _sqlite_fts_available():
+        match = ' '.join(f'"{t}"*' for t in tokens)
+        return books.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,)),
+        ).annotate(
+            # bm25() only works inside the MATCH query, so rank each row with
+            # a rowid lookup. It is lower-is-better; weight title over author
+            # over ISBN.
+            search_rank=RawSQL(
+                f'(SELECT -bm25({FTS_TABLE}, 10.0, 5.0, 2.0) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = lms_app_book.id)',
+                (match,),
+                output_field=FloatField(),
+            ),
+        )
+
+    condition = Q()
+    for token in tokens:
+        condition &= Q(title__icontains=token) | Q(author__icontains=token) | Q(isbn__icontains=token)
+    return books.filter(condition).annotate(search_rank=RawSQL('0.0', (), output_field=FloatField()))
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .circulation import borrow_deleted, borrow_saved
+from .email_rendering import invalidate_admin_emails
+from .counters import pending_changed
+from .models import Admin, Book, BookReview, Borrow, Student
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=BookReview)
+def remove_review_from_book_ratings(sender, instance, **kwargs):
+    # Fires for cascaded deletes too (e.g. a student being removed).
+    Book.apply_rating_change(instance.book_id, old_rating=instance.rating)
+
+
+@receiver(post_save, sender=Admin)
+@receiver(post_delete, sender=Admin)
+def invalidate_admin_recipients(sender, **kwargs):
+    invalidate_admin_emails()
+
+
+@receiver(post_save, sender=Borrow)
+def count_new_borrow(sender, instance, created, raw=False, **kwargs):
+    # Later status changes are counted where they happen (lms_app.circulation).
+    if not raw:
+        borrow_saved(instance, created)
+
+
+@receiver(post_delete, sender=Borrow)
+def uncount_deleted_borrow(sender, instance, **kwargs):
+    borrow_deleted(instance)
+
+
+@receiver(post_save, sender=Borrow)
+@receiver(post_delete, sender=Borrow)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def refresh_pending_counts(sender, **kwargs):
+    # Status flips done with QuerySet.update() call pending_changed() themselves.
+    pending_changed()
@@ -0,0 +1,126 @@
+import asyncio
+import random
+import threading
+
+BANNER = 'lms-smtp-sink'
+
+
+class SMTPSink:
+    """
+    A local SMTP server that accepts and discards mail, for exercising the
+    real SMTP send path without a relay account. It speaks just enough
+    ESMTP for Django's smtp backend with TLS and auth off: EHLO/HELO, MAIL,
+    RCPT, DATA, RSET, NOOP and QUIT.
+
+    ``latency`` seconds are added before each DATA reply. A ``fail_rate``
+    fraction of messages is rejected with a 550, and a ``drop_rate``
+    fraction has the connection cut before the reply, which the client
+    sees as SMTPServerDisconnected.
+
+    Runs its own event loop on a background thread:
+
+        with SMTPSink(latency=0.02) as sink:
+            ...  # send to sink.host:sink.port
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_rate=0.0, drop_rate=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.connections = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='smtp-sink', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+
+        async def reply(line):
+            writer.write(f'{line}\r\n'.encode())
+            await writer.drain()
+
+        recipients = []
+        try:
+            await reply(f'220 {BANNER} ESMTP')
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                verb = line[:4].decode('ascii', 'replace').upper()
+                if verb == 'EHLO':
+                    await reply(f'250-{BANNER}\r\n250 8BITMIME')
+                elif verb in ('HELO', 'NOOP'):
+                    await reply('250 OK')
+                elif verb in ('MAIL', 'RSET'):
+                    recipients = []
+                    await reply('250 OK')
+                elif verb == 'RCPT':
+                    recipients.append(line)
+                    await reply('250 OK')
+                elif verb == 'DATA':
+                    if not recipients:
+                        await reply('503 Need RCPT first')
+                        continue
+                    await reply('354 End data with <CR><LF>.<CR><LF>')
+                    while await reader.readline() not in (b'.\r\n', b'.\n', b''):
+                        pass
+                    recipients = []
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    roll = self.random.random()
+                    if roll < self.drop_rate:
+                        self.dropped += 1
+                        break
+                    if roll < self.drop_rate + self.fail_rate:
+                        self.rejected += 1
+                        await reply('550 Rejected by sink')
+                    else:
+                        self.accepted += 1
+                        await reply('250 OK queued')
+                elif verb == 'QUIT':
+                    await reply('221 Bye')
+                    break
+                else:
+                    await reply('502 Command not implemented')
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
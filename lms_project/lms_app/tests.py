@@ -1,3 +1,711 @@
-from django.test import TestCase
+import re
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .circulation import rebuild
+from .catalog import encode_cursor, filter_books, paginate_books
+from .checkpoints import scan, start_scan
+from .counters import notification_version, pending_counts, unread_count
+from .email_rendering import active_admin_emails
+from .models import (
+    DAILY_NOTIFICATION_TYPES, Admin, Book, Borrow, DailyCirculationStats, EmailNotificationLog, FineLedger, FineWaiver, Notification,
+    ScanCheckpoint, Student,
+)
+from .notifications import (
+    PENDING_CLAIM_LEASE, _claim_daily_sends, create_notification, email_batch, email_dispatcher,
+    release_stale_claims, send_overdue_admin_digest, send_return_reminder, sent_today_keys,
+)
+from .search import FTS_TABLE, SQLITE_TRIGGERS, ensure_search_index
+from .fines import accrue_fines, annotate_live_fines, post_waiver
+from .views import BORROW_PAGE_SIZE, _bulk_approve_borrows, _bulk_reject_borrows, _bulk_return_borrows
+
+# Every test class runs against its own in-memory cache, whatever the
+# runner (manage.py test, pytest-django, ...), so version and counter keys
+# never leak into or out of the dev cache configured in settings.
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lms-tests',
+    },
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConcurrentApprovalTests(TransactionTestCase):
+    STOCK = 5
+    REQUESTS = 200
+    WORKERS = 16
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Hot Title', author='Author', isbn='9990000000001', quantity=self.STOCK,
+        )
+        self.admin = Admin.objects.create(email='desk@example.com', name='Desk', password='!')
+        User.objects.bulk_create(
+            User(username=f'stress{i}', email=f'stress{i}@example.com') for i in range(self.REQUESTS)
+        )
+        users = User.objects.filter(username__startswith='stress').order_by('id')
+        Student.objects.bulk_create(
+            Student(user=user, roll_no=f'ST{i:04d}', branch='CS', status='approved')
+            for i, user in enumerate(users)
+        )
+        Borrow.objects.bulk_create(
+            Borrow(student=student, book=self.book, status='pending')
+            for student in Student.objects.filter(roll_no__startswith='ST')
+        )
+
+    def _admin_client(self):
+        client = Client(HTTP_HOST='localhost')
+        session = client.session
+        session['admin_id'] = self.admin.id
+        session.save()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        return client
+
+    def _approve(self, borrow_id):
+        try:
+            client = self._admin_client()
+            return client.post(reverse('admin_approve_borrow', args=[borrow_id])).status_code
+        finally:
+            connection.close()
+
+    def test_concurrent_approvals_never_oversell(self):
+        borrow_ids = list(Borrow.objects.values_list('id', flat=True))
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            statuses = list(pool.map(self._approve, borrow_ids))
+
+        self.assertEqual(statuses, [302] * self.REQUESTS)
+        self.book.refresh_from_db()
+        approved = Borrow.objects.filter(book=self.book, status='approved').count()
+        self.assertEqual(self.book.quantity, 0)
+        self.assertEqual(approved, self.STOCK)
+
+    def test_double_approval_takes_one_copy(self):
+        borrow_id = Borrow.objects.values_list('id', flat=True).first()
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            list(pool.map(self._approve, [borrow_id] * 50))
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.quantity, self.STOCK - 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryPlanTests(TestCase):
+    """
+    The reminder commands, fines page and notification badge run these
+    queries on every pass; each must be answered from an index rather than a
+    full table scan. Ordered index walks (``SCAN ... USING INDEX``) are fine.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='plan', email='plan@example.com')
+        cls.student = Student.objects.create(user=user, roll_no='PL0001', branch='CS', status='approved')
+        cls.book = Book.objects.create(title='Plan', author='Author', isbn='9990000000002', quantity=3)
+        cls.borrow = Borrow.objects.create(student=cls.student, book=cls.book, status='approved')
+
+    def assertUsesIndex(self, queryset):
+        if connection.vendor == 'postgresql':
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                plan = queryset.explain()
+            self.assertNotIn('Seq Scan', plan, plan)
+        elif connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            bare_scans = re.findall(r'SCAN (?:TABLE )?\w+$', plan, re.MULTILINE)
+            self.assertEqual(bare_scans, [], plan)
+        else:
+            self.skipTest(f'no plan check for {connection.vendor}')
+
+    def test_due_reminder_queries(self):
+        today = timezone.now().date()
+        self.assertUsesIndex(Borrow.objects.filter(status='approved', is_returned=False))
+        self.assertUsesIndex(Borrow.objects.filter(
+            status='approved', is_returned=False, expected_return_date=today + timedelta(days=1),
+        ))
+        self.assertUsesIndex(Borrow.objects.filter(
+            status='approved', is_returned=False,
+            expected_return_date__gte=today, expected_return_date__lte=today + timedelta(days=2),
+        ))
+
+    def test_fines_and_pending_queries(self):
+        today = timezone.now().date()
+        self.assertUsesIndex(Borrow.objects.filter(
+            Q(fine_amount__gt=0) | Q(status='approved', is_returned=False, expected_return_date__lt=today)
+        ).order_by('-borrow_date'))
+        self.assertUsesIndex(Borrow.objects.filter(status='pending'))
+        self.assertUsesIndex(Borrow.objects.order_by('-borrow_date', '-id')[:50])
+
+    def test_notification_queries(self):
+        self.assertUsesIndex(Notification.objects.filter(student=self.student, is_read=False))
+        self.assertUsesIndex(Notification.objects.filter(student=self.student).order_by('-created_at')[:10])
+        self.assertUsesIndex(Notification.objects.filter(kind='due_reminder', send_date=timezone.localdate()))
+
+    def test_email_log_dedupe_query(self):
+        today = timezone.localdate()
+        self.assertUsesIndex(EmailNotificationLog.objects.filter(
+            Q(success=True) | Q(success__isnull=True),
+            notification_type='reminder_2day', borrow=self.borrow,
+            recipient_email='plan@example.com', send_date=today,
+        ))
+        self.assertUsesIndex(EmailNotificationLog.objects.filter(
+            Q(success=True) | Q(success__isnull=True),
+            send_date=today, notification_type__in=DAILY_NOTIFICATION_TYPES,
+        ))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.admin = Admin.objects.create(email='etag@example.com', name='Etag', password='!')
+        self.book = Book.objects.create(title='Etag Title', author='Author', isbn='9990000000003', quantity=2)
+        user = User.objects.create(username='etag', email='etag@example.com')
+        self.student = Student.objects.create(user=user, roll_no='ET0001', branch='CS', status='approved')
+        self.client = Client(HTTP_HOST='localhost')
+        session = self.client.session
+        session['admin_id'] = self.admin.id
+        session.save()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+    def test_unchanged_poll_is_not_modified(self):
+        url = reverse('admin_pending_counts')
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertNotIn('no-store', first['Cache-Control'])
+
+        with self.assertNumQueries(2):  # session and admin lookup only
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Borrow.objects.create(student=self.student, book=self.book, status='pending')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_pages_default_to_no_store(self):
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertIn('no-store', response['Cache-Control'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CirculationRollupTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='Rollup Title', author='Author', isbn='9990000000004', quantity=3)
+        self.students = []
+        for i in range(4):
+            user = User.objects.create(username=f'roll{i}', email=f'roll{i}@example.com')
+            self.students.append(Student.objects.create(user=user, roll_no=f'RO{i:04d}', branch='CS', status='approved'))
+
+    def rollup(self):
+        return sorted(DailyCirculationStats.objects.values_list('date', 'book_id', 'borrows', 'returns', 'rejections'))
+
+    def test_incremental_rollup_matches_backfill(self):
+        due = timezone.now().date() + timedelta(days=7)
+        ids = [Borrow.objects.create(student=s, book=self.book, expected_return_date=due).id for s in self.students]
+        _bulk_approve_borrows(ids[:2])
+        _bulk_reject_borrows(ids[2:3], 'No copies')
+        _bulk_return_borrows(ids[:1])
+        Borrow.objects.get(id=ids[3]).delete()
+
+        today = timezone.now().date()
+        self.assertEqual(self.rollup(), [(today, self.book.id, 3, 1, 1)])
+        incremental = self.rollup()
+        rebuild()
+        self.assertEqual(self.rollup(), incremental)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BookSearchTests(TestCase):
+    def setUp(self):
+        Book.objects.create(title='Clean Code', author='Robert Martin', isbn='978-0132350884')
+        Book.objects.create(title='The Clean Coder', author='Robert Martin', isbn='9780137081073')
+        Book.objects.create(title='Refactoring', author='Martin Fowler', isbn='9780201485677')
+        user = User.objects.create(username='reader', email='reader@example.com')
+        Student.objects.create(user=user, roll_no='SR0001', branch='CS', status='approved')
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(user)
+
+    def titles(self, **params):
+        page, _ = paginate_books(filter_books(params), sort=params.get('sort', ''))
+        return [book.title for book in page]
+
+    def test_query_matches_prefixes_and_isbn(self):
+        self.assertEqual(sorted(self.titles(q='clea cod')), ['Clean Code', 'The Clean Coder'])
+        self.assertEqual(self.titles(q='9780132350884'), ['Clean Code'])
+        response = self.client.get(reverse('dashboard_books'), {'q': 'fowler'})
+        self.assertEqual(response.json()['count'], 1)
+        self.assertIn('Refactoring', response.json()['html'])
+
+    def test_relevance_ranks_title_over_author(self):
+        Book.objects.create(title='Patterns', author='Clean Coder', isbn='9990000000005')
+        self.assertEqual(self.titles(q='coder', sort='relevance'), ['The Clean Coder', 'Patterns'])
+
+    def test_relevance_sort_pages_with_the_cursor(self):
+        Book.objects.create(title='Patterns', author='Clean Coder', isbn='9990000000005')
+        Book.objects.create(title='Clean Architecture', author='Robert Martin', isbn='9780134494166')
+        everything, _ = paginate_books(filter_books({'q': 'clean'}), sort='relevance', limit=10)
+        self.assertEqual(len(everything), 4)
+        seen, cursor = [], None
+        while True:
+            page, cursor = paginate_books(filter_books({'q': 'clean'}), sort='relevance', cursor=cursor, limit=1)
+            seen.extend(page)
+            if not cursor:
+                break
+        self.assertEqual([book.id for book in seen], [book.id for book in everything])
+
+    def test_books_added_or_edited_after_migrate_are_indexed(self):
+        book = Book.objects.create(title='Domain-Driven Design', author='Eric Evans', isbn='9780321125217')
+        self.assertEqual(self.titles(q='evans'), ['Domain-Driven Design'])
+        book.title = 'Implementing Domain-Driven Design'
+        book.save()
+        self.assertEqual(self.titles(q='implementing'), ['Implementing Domain-Driven Design'])
+        book.delete()
+        self.assertEqual(self.titles(q='evans'), [])
+
+    def test_lost_triggers_are_restored_after_migrate(self):
+        if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+            self.skipTest('SQLite FTS5 index only')
+        with connection.cursor() as cursor:
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        Book.objects.create(title='Unindexed', author='Nobody', isbn='9990000000006')
+        self.assertEqual(self.titles(q='unindexed'), [])
+
+        ensure_search_index()
+        self.assertEqual(self.titles(q='unindexed'), ['Unindexed'])
+        Book.objects.create(title='Indexed Again', author='Somebody', isbn='9990000000007')
+        self.assertEqual(self.titles(q='indexed again'), ['Indexed Again'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CatalogCursorTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            Book.objects.create(title=f'Paged {i}', author='Author', isbn=f'97300000000{i:02d}', quantity=i)
+        user = User.objects.create(username='pager', email='pager@example.com')
+        Student.objects.create(user=user, roll_no='PG0001', branch='CS', status='approved')
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(user)
+
+    def page(self, **params):
+        response = self.client.get(reverse('dashboard_books'), {'limit': 2, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_walks_every_sort(self):
+        for sort in ('', 'title-desc', 'avail-desc'):
+            seen, cursor = [], None
+            while True:
+                data = self.page(sort=sort, **({'cursor': cursor} if cursor else {}))
+                seen.append(data['html'])
+                cursor = data['next_cursor']
+                if not cursor:
+                    break
+            self.assertEqual(len(seen), 3, sort)
+
+    def test_tampered_cursor_falls_back_to_the_first_page(self):
+        first = self.page(sort='avail-desc')['html']
+        tampered = [
+            encode_cursor(['many', 3]),
+            encode_cursor([3, 'x']),
+            encode_cursor([3, 2 ** 80]),
+            encode_cursor([True, 3]),
+            encode_cursor([3]),
+            encode_cursor({'a': 1}),
+            'not base64 at all!',
+        ]
+        for cursor in tampered:
+            self.assertEqual(self.page(sort='avail-desc', cursor=cursor)['html'], first, cursor)
+        self.assertEqual(self.page(sort='title-asc', cursor=encode_cursor([5, 1]))['html'], self.page(sort='title-asc')['html'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FineTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='Late Title', author='Author', isbn='9990000000008', quantity=10)
+        self.admin = Admin.objects.create(email='fines@example.com', name='Fines', password='!')
+        today = timezone.now().date()
+        self.borrows = []
+        for i in range(6):
+            user = User.objects.create(username=f'late{i}', email=f'late{i}@example.com')
+            student = Student.objects.create(user=user, roll_no=f'LT{i:04d}', branch='CS', status='approved')
+            # Four days overdue, due today or due next week.
+            self.borrows.append(Borrow.objects.create(
+                student=student, book=self.book, status='approved', is_approved=True,
+                expected_return_date=today + timedelta(days=(-4, -4, 0, 7)[i % 4]),
+            ))
+        FineWaiver.objects.create(
+            borrow=self.borrows[0], requested_by=self.admin, original_fine=20,
+            waived_amount=5, reason='Hospital stay', status='approved',
+        )
+
+    def test_live_fine_annotation_matches_calculate_fine(self):
+        borrows = annotate_live_fines(Borrow.objects.select_related('book'))
+        for borrow in borrows:
+            self.assertEqual(borrow.live_fine, borrow.calculate_fine(), borrow.expected_return_date)
+        self.assertEqual(sorted(b.overdue_days for b in borrows), [0, 0, 4, 4, 4, 4])
+
+    @override_settings(TIME_ZONE='Asia/Kolkata')
+    def test_live_fine_and_calculate_fine_use_the_same_day_across_midnight(self):
+        # 01:30 in Kolkata is still the previous day in UTC.
+        utc_now = timezone.now().replace(hour=20, minute=0) - timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=utc_now):
+            self.assertNotEqual(timezone.localdate(), utc_now.date())
+            for borrow in annotate_live_fines(Borrow.objects.select_related('book')):
+                self.assertEqual(borrow.live_fine, borrow.calculate_fine(), borrow.expected_return_date)
+
+    def test_bulk_return_fines_match_calculate_fine_in_constant_queries(self):
+        expected = {b.id: b.calculate_fine() for b in Borrow.objects.select_related('book')}
+        self.assertEqual(expected[self.borrows[0].id], 15)
+
+        with CaptureQueriesContext(connection) as small:
+            _bulk_return_borrows([b.id for b in self.borrows[:1]])
+        with CaptureQueriesContext(connection) as large:
+            _bulk_return_borrows([b.id for b in self.borrows[1:]])
+
+        self.assertEqual(dict(Borrow.objects.values_list('id', 'fine_amount')), expected)
+        self.assertEqual(len(small), len(large))
+
+    def test_ledger_tracks_live_fine_after_waiver_and_accrual(self):
+        today = timezone.now().date()
+        borrow = self.borrows[1]
+        for days_ago in (3, 2, 1):
+            accrue_fines(today - timedelta(days=days_ago))
+        # Approved before tonight's accrual: more than has been posted so far.
+        post_waiver(FineWaiver.objects.create(
+            borrow=borrow, requested_by=self.admin, original_fine=20,
+            waived_amount=18, reason='Lost in post', status='approved',
+        ))
+        accrue_fines(today)
+
+        live = annotate_live_fines(Borrow.objects.filter(id=borrow.id)).get().live_fine
+        posted = sum(FineLedger.objects.filter(borrow=borrow).values_list('amount', flat=True))
+        self.assertEqual(live, 2)
+        self.assertEqual(posted, live)
+        borrow.student.refresh_from_db()
+        self.assertEqual(borrow.student.fine_balance, live)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EmailClaimTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username='claim', email='claim@example.com')
+        student = Student.objects.create(user=user, roll_no='CL0001', branch='CS', status='approved')
+        book = Book.objects.create(title='Claimed', author='Author', isbn='9990000000009', quantity=3)
+        self.borrow = Borrow.objects.create(
+            student=student, book=book, status='approved',
+            expected_return_date=timezone.now().date() + timedelta(days=2),
+        )
+        self.key = ('reminder_2day', self.borrow.id, 'claim@example.com')
+
+    def test_claim_is_pending_until_the_send_is_recorded(self):
+        self.assertTrue(send_return_reminder(self.borrow, 2))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(list(EmailNotificationLog.objects.values_list('success', flat=True)), [True])
+        self.assertFalse(send_return_reminder(self.borrow, 2))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_stale_pending_claim_is_retried(self):
+        # A run killed after claiming but before recording the send.
+        claimed = _claim_daily_sends('Reminder', ['claim@example.com'], 'reminder_2day', self.borrow)
+        log = EmailNotificationLog.objects.get(id=claimed['claim@example.com'])
+        self.assertIsNone(log.success)
+        self.assertIn(self.key, sent_today_keys())
+        self.assertEqual(release_stale_claims(), 0)
+        self.assertFalse(send_return_reminder(self.borrow, 2))
+
+        EmailNotificationLog.objects.filter(id=log.id).update(
+            sent_at=timezone.now() - PENDING_CLAIM_LEASE - timedelta(minutes=1),
+        )
+        self.assertEqual(release_stale_claims(), 1)
+        self.assertNotIn(self.key, sent_today_keys())
+        self.assertTrue(send_return_reminder(self.borrow, 2))
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EmailBatchTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username='batch', email='batch@example.com')
+        student = Student.objects.create(user=user, roll_no='EB0001', branch='CS', status='approved')
+        due = timezone.now().date() + timedelta(days=2)
+        self.borrows = [
+            Borrow.objects.create(
+                student=student, status='approved', expected_return_date=due,
+                book=Book.objects.create(title=f'Batched {i}', author='Author', isbn=f'97700000000{i:02d}', quantity=1),
+            )
+            for i in range(3)
+        ]
+
+    def test_notifications_in_a_batch_share_one_connection(self):
+        with mock.patch('lms_app.notifications.get_connection', wraps=get_connection) as connect:
+            with email_batch():
+                for borrow in self.borrows:
+                    self.assertTrue(send_return_reminder(borrow, 2))
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_connection_is_recycled_after_batch_size_messages(self):
+        messages = [EmailMessage('Subject', 'Body', to=[f'r{i}@example.com']) for i in range(5)]
+        with mock.patch('lms_app.notifications.get_connection', wraps=get_connection) as connect:
+            with email_batch(batch_size=2) as batch:
+                self.assertEqual(batch.send_all(messages), [True] * 5)
+        self.assertEqual(connect.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OverdueDigestTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username='digest', email='digest@example.com')
+        student = Student.objects.create(user=user, roll_no='OD0001', branch='CS', status='approved')
+        overdue = timezone.now().date() - timedelta(days=3)
+        for i in range(3):
+            Borrow.objects.create(
+                student=student, status='approved', expected_return_date=overdue,
+                book=Book.objects.create(title=f'Overdue {i}', author='Author', isbn=f'97600000000{i:02d}', quantity=1),
+            )
+        self.admin_emails = ['a1@example.com', 'a2@example.com']
+
+    def _overdue(self):
+        return list(annotate_live_fines(Borrow.objects.all()).select_related('student', 'book'))
+
+    def test_each_admin_gets_one_digest_a_day(self):
+        self.assertEqual(send_overdue_admin_digest(self._overdue(), self.admin_emails), 2)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), self.admin_emails)
+        for message in mail.outbox:
+            self.assertEqual(len(message.to), 1)
+            for i in range(3):
+                self.assertIn(f'Overdue {i}', message.body)
+        # Still one 'overdue_admin' row per borrow and admin.
+        self.assertEqual(EmailNotificationLog.objects.filter(notification_type='overdue_admin', success=True).count(), 6)
+
+        self.assertEqual(send_overdue_admin_digest(self._overdue(), self.admin_emails, sent_keys=sent_today_keys()), 0)
+        self.assertEqual(send_overdue_admin_digest(self._overdue(), self.admin_emails), 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AdminEmailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = Admin.objects.create(email='first@example.com', name='First', password='x')
+
+    def test_admin_saves_and_deletes_refresh_the_cached_list(self):
+        self.assertEqual(active_admin_emails(), ['first@example.com'])
+        with self.assertNumQueries(0):
+            self.assertEqual(active_admin_emails(), ['first@example.com'])
+
+        second = Admin.objects.create(email='second@example.com', name='Second', password='x')
+        self.assertEqual(sorted(active_admin_emails()), ['first@example.com', 'second@example.com'])
+
+        self.admin.is_active = False
+        self.admin.save()
+        self.assertEqual(active_admin_emails(), ['second@example.com'])
+
+        second.delete()
+        self.assertEqual(active_admin_emails(), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EmailDispatcherTests(TestCase):
+    def test_workers_share_the_rate_limit(self):
+        rate, count = 20, 6
+        with email_dispatcher(workers=3, rate=rate) as dispatcher:
+            for i in range(count):
+                recipient = f'r{i}@example.com'
+                dispatcher.submit(
+                    EmailMessage('Subject', 'Body', to=[recipient]),
+                    EmailNotificationLog(notification_type='signup_received', recipient_email=recipient, subject='Subject'),
+                )
+        self.assertEqual((dispatcher.sent, dispatcher.failed), (count, 0))
+        self.assertEqual(len(mail.outbox), count)
+        self.assertEqual(EmailNotificationLog.objects.filter(success=True).count(), count)
+        # The first send goes straight out; each later one waits 1/rate seconds.
+        self.assertGreaterEqual(dispatcher.elapsed, (count - 1) / rate * 0.95)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResumableScanTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username='scan', email='scan@example.com')
+        student = Student.objects.create(user=user, roll_no='SC0001', branch='CS', status='approved')
+        due = timezone.now().date() + timedelta(days=2)
+        self.borrows = [
+            Borrow.objects.create(
+                student=student, status='approved', expected_return_date=due,
+                book=Book.objects.create(title=f'Scanned {i}', author='Author', isbn=f'97500000000{i:02d}', quantity=1),
+            )
+            for i in range(4)
+        ]
+
+    def test_interrupted_scan_resumes_after_the_last_saved_chunk(self):
+        checkpoint = start_scan('test_scan')
+        for i, _ in enumerate(scan(Borrow.objects.all(), checkpoint, chunk_size=2)):
+            if i == 2:
+                break  # Killed part-way through the second chunk.
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.last_pk, self.borrows[1].pk)
+        self.assertFalse(checkpoint.finished)
+
+        checkpoint = start_scan('test_scan', resume=True)
+        self.assertEqual(list(scan(Borrow.objects.all(), checkpoint, chunk_size=2)), self.borrows[2:])
+        checkpoint.refresh_from_db()
+        self.assertTrue(checkpoint.finished)
+        # A finished run is not resumed.
+        self.assertEqual(start_scan('test_scan', resume=True).last_pk, 0)
+
+    def test_send_notifications_resume_skips_checkpointed_borrows(self):
+        ScanCheckpoint.objects.create(
+            job='send_notifications', run_date=timezone.localdate(), last_pk=self.borrows[1].pk,
+        )
+        call_command('send_notifications', '--resume', stdout=StringIO())
+        reminded = EmailNotificationLog.objects.filter(notification_type='reminder_2day', success=True)
+        self.assertEqual(sorted(reminded.values_list('borrow_id', flat=True)), [b.pk for b in self.borrows[2:]])
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertTrue(ScanCheckpoint.objects.get(job='send_notifications').finished)
+
+    def test_crash_mid_chunk_with_workers_loses_no_reminders(self):
+        class Crash(Exception):
+            pass
+
+        calls = []
+
+        def send_then_crash(borrow, *args, **kwargs):
+            calls.append(borrow)
+            if len(calls) == 4:
+                raise Crash
+            return send_return_reminder(borrow, *args, **kwargs)
+
+        def die(dispatcher):
+            # The process is gone: workers stop, nothing more is recorded.
+            for _ in dispatcher.threads:
+                dispatcher.jobs.put(None)
+            for thread in dispatcher.threads:
+                thread.join()
+
+        command = 'lms_app.management.commands.send_notifications'
+        with mock.patch(f'{command}.send_return_reminder', send_then_crash), \
+                mock.patch('lms_app.notifications.EmailDispatcher.close', die):
+            with self.assertRaises(Crash):
+                call_command('send_notifications', '--workers', '2', '--chunk-size', '2', stdout=StringIO())
+
+        # The first chunk was recorded before its checkpoint; the third
+        # borrow's mail was queued but its claim is still pending.
+        checkpoint = ScanCheckpoint.objects.get(job='send_notifications')
+        self.assertEqual(checkpoint.last_pk, self.borrows[1].pk)
+        logs = EmailNotificationLog.objects.filter(notification_type='reminder_2day')
+        self.assertEqual(
+            dict(logs.values_list('borrow_id', 'success')),
+            {self.borrows[0].pk: True, self.borrows[1].pk: True, self.borrows[2].pk: None},
+        )
+
+        call_command('send_notifications', '--resume', '--workers', '2', '--chunk-size', '2', stdout=StringIO())
+        sent = logs.filter(success=True).values_list('borrow_id', flat=True)
+        self.assertEqual(sorted(sent), [b.pk for b in self.borrows])
+        checkpoint.refresh_from_db()
+        self.assertTrue(checkpoint.finished)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CounterCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='counter', email='counter@example.com')
+        self.student = Student.objects.create(user=user, roll_no='CT0001', branch='CS', status='approved')
+        self.book = Book.objects.create(title='Counted', author='Author', isbn='9740000000001', quantity=1)
+
+    def test_unread_count_and_version_change_on_commit(self):
+        self.assertEqual(unread_count(self.student.id), 0)
+        version = notification_version(self.student.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_notification(self.student, 'Hello')
+            # Other requests keep seeing the committed state until then.
+            self.assertEqual(unread_count(self.student.id), 0)
+            self.assertEqual(notification_version(self.student.id), version)
+        self.assertEqual(unread_count(self.student.id), 1)
+        self.assertNotEqual(notification_version(self.student.id), version)
+
+    def test_pending_counts_refresh_after_commit(self):
+        self.assertEqual(pending_counts(), {'borrow_pending': 0, 'signup_pending': 0})
+        with self.captureOnCommitCallbacks() as callbacks:
+            Borrow.objects.create(student=self.student, book=self.book, status='pending')
+        self.assertTrue(callbacks)
+        # Cached until the callbacks run at commit.
+        self.assertEqual(pending_counts()['borrow_pending'], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(pending_counts()['borrow_pending'], 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AdminBorrowRequestsTests(TestCase):
+    def setUp(self):
+        self.admin = Admin.objects.create(email='requests@example.com', name='Requests', password='!')
+        self.book = Book.objects.create(title='Requested', author='Author', isbn='9720000000001', quantity=100)
+        user = User.objects.create(username='requester', email='requester@example.com')
+        self.student = Student.objects.create(user=user, roll_no='RQ0001', branch='CS', status='approved')
+        Borrow.objects.bulk_create([
+            Borrow(student=self.student, book=self.book, status='pending') for _ in range(BORROW_PAGE_SIZE + 5)
+        ])
+        self.client = Client(HTTP_HOST='localhost')
+        session = self.client.session
+        session['admin_id'] = self.admin.id
+        session.save()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+    def ids(self, **params):
+        response = self.client.get(reverse('admin_borrow_requests'), params)
+        self.assertEqual(response.status_code, 200)
+        return [borrow.id for borrow in response.context['borrows']]
+
+    def test_cursor_pages_through_requests(self):
+        first = self.ids()
+        self.assertEqual(len(first), BORROW_PAGE_SIZE)
+        last = Borrow.objects.get(id=first[-1])
+        rest = self.ids(cursor=encode_cursor([last.borrow_date.isoformat(), last.id]))
+        self.assertEqual(len(rest), 5)
+        self.assertFalse(set(first) & set(rest))
+
+    def test_tampered_cursor_shows_the_first_page(self):
+        first = self.ids()
+        for cursor in (encode_cursor(['yesterday', 3]), encode_cursor(['2026-01-01', 'x']), encode_cursor([5, 3])):
+            self.assertEqual(self.ids(cursor=cursor), first, cursor)
+
+    def test_select_all_matching_applies_to_every_page_of_the_filter(self):
+        other_user = User.objects.create(username='other', email='other@example.com')
+        other = Student.objects.create(user=other_user, roll_no='RQ0002', branch='CS', status='approved')
+        untouched = Borrow.objects.create(student=other, book=self.book, status='pending')
+
+        page = self.client.get(reverse('admin_borrow_requests'), {'status': 'pending', 'student': 'RQ0001'})
+        self.assertContains(page, f'Select all {BORROW_PAGE_SIZE + 5} requests matching this filter')
+
+        response = self.client.post(reverse('admin_bulk_borrow_action'), {
+            'action': 'approve', 'scope': 'filter', 'status': 'pending', 'student': 'RQ0001',
+        })
+        self.assertRedirects(response, reverse('admin_borrow_requests'), fetch_redirect_response=False)
+        self.assertEqual(
+            Borrow.objects.filter(student=self.student, status='approved').count(), BORROW_PAGE_SIZE + 5,
+        )
+        untouched.refresh_from_db()
+        self.assertEqual(untouched.status, 'pending')
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.quantity, 100 - BORROW_PAGE_SIZE - 5)
@@ -9,6 +9,7 @@ urlpatterns = [
     path('login/', views.student_login, name='student_login'),
     path('logout/', views.student_logout, name='student_logout'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/books/', views.dashboard_books, name='dashboard_books'),
     path('borrow/<int:book_id>/', views.borrow_book, name='borrow_book'),
     path('return/<int:borrow_id>/', views.return_book, name='return_book'),
     path('my-borrowed-books/', views.my_borrowed_books, name='my_borrowed_books'),
@@ -38,10 +39,12 @@ urlpatterns = [
     path('admin-portal/books/delete/<int:book_id>/', views.admin_delete_book_view, name='admin_delete_book'),
     
     path('admin-portal/pending-counts/', views.admin_pending_counts_json, name='admin_pending_counts'),
+    path('admin-portal/pending-counts/stream/', views.admin_pending_counts_stream, name='admin_pending_counts_stream'),
     path('admin-portal/borrow-requests/', views.admin_borrow_requests_view, name='admin_borrow_requests'),
     path('admin-portal/borrow-requests/approve/<int:borrow_id>/', views.admin_approve_borrow_view, name='admin_approve_borrow'),
     path('admin-portal/borrow-requests/reject/<int:borrow_id>/', views.admin_reject_borrow_view, name='admin_reject_borrow'),
     path('admin-portal/borrow-requests/return/<int:borrow_id>/', views.admin_return_book_view, name='admin_return_book'),
+    path('admin-portal/borrow-requests/bulk/', views.admin_bulk_borrow_action_view, name='admin_bulk_borrow_action'),
     
     path('admin-portal/admins/', views.admin_manage_admins_view, name='admin_manage_admins'),
     path('admin-portal/admins/add/', views.admin_add_admin_view, name='admin_add_admin'),
@@ -63,6 +66,7 @@ urlpatterns = [
 
     path('notifications/', views.notifications_list, name='notifications_list'),
     path('notifications/json/', views.notifications_json, name='notifications_json'),
+    path('notifications/stream/', views.notifications_stream, name='notifications_stream'),
     path('notifications/read/<int:notif_id>/', views.mark_notification_read, name='mark_notification_read'),
 
     path('social-wall/', views.social_wall, name='social_wall'),
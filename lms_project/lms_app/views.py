@@ -3,7 +3,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from .forms import StudentSignupForm, StudentLoginForm, ProfileUpdateForm, AdminLoginForm, AdminCreateForm, BookForm, StudentCreateForm, CSVUploadForm, AdminProfileUpdateForm, AdminEditForm
 from django.contrib.auth.models import User
-from .models import Book, Borrow, Student, Admin, Post, Like, Comment, FineWaiver, BookReview, Notification
+from .models import Book, Borrow, Student, Admin, Post, Like, Comment, FineWaiver, BookReview, Notification, DailyCirculationStats
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.utils import timezone
@@ -18,6 +18,11 @@ import csv
 import io
 from django.http import HttpResponse, JsonResponse
 from .moderation import validate_content
+from .cache_policy import make_etag, revalidate
+from .circulation import borrows_rejected, borrows_returned
+from .counters import notification_version, notifications_changed, pending_changed, pending_counts, unread_count
+from .notifications import create_notification, create_notifications_bulk
+from .live import PENDING, STOCK, live_response, version
 
 
 def student_signup(request):
@@ -26,20 +31,17 @@ def student_signup(request):
     if request.method == 'POST':
         user_form = StudentSignupForm(request.POST)
         if user_form.is_valid():
-            user = User.objects.create_user(
-                username=user_form.cleaned_data['username'],
-                password=user_form.cleaned_data['password'],
-                email=user_form.cleaned_data['email']
-            )
-            student = user_form.save(commit=False)
-            student.user = user
-            student.save()
-            try:
-                from .notifications import send_signup_received_notification
+            from .notifications import send_signup_received_notification
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=user_form.cleaned_data['username'],
+                    password=user_form.cleaned_data['password'],
+                    email=user_form.cleaned_data['email']
+                )
+                student = user_form.save(commit=False)
+                student.user = user
+                student.save()
                 send_signup_received_notification(student)
-            except Exception as e:
-                import logging
-                logging.getLogger(__name__).error(f"Failed to send signup received email: {e}")
             messages.success(request, 'Signup successful! Your account is pending admin approval. You will be able to login once approved.')
             return redirect('student_login')
     else:
@@ -88,35 +90,44 @@ def student_logout(request):
 
 @login_required
 def dashboard(request):
-    from django.db.models import Avg, Count
-    books = Book.objects.annotate(
-        avg_rating=Avg('reviews__rating'),
-        review_count=Count('reviews'),
-    )
+    from .catalog import filter_books, paginate_books, get_facets
+    books, next_cursor = paginate_books(filter_books({}))
     student = request.user.student
-    # Throttle: run due-soon check at most once every 6 hours per student session
-    _due_check_key = f'due_check_{student.id}'
-    _last_check = request.session.get(_due_check_key, 0)
-    _now_ts = timezone.now().timestamp()
-    if _now_ts - _last_check > 6 * 3600:
-        send_due_soon_notifications()
-        request.session[_due_check_key] = _now_ts
-    _placeholder = ('', 'dummy')
-    categories = sorted(Book.objects.exclude(category__in=_placeholder).values_list('category', flat=True).distinct())
-    departments = sorted(Book.objects.exclude(department__in=_placeholder).values_list('department', flat=True).distinct())
-    languages = sorted(Book.objects.exclude(language__in=_placeholder).values_list('language', flat=True).distinct())
+    facets = get_facets()
     context = {
         'books': books,
+        'next_cursor': next_cursor,
         'student': student,
-        'categories': categories,
-        'departments': departments,
-        'languages': languages,
+        'categories': facets['category'],
+        'departments': facets['department'],
+        'languages': facets['language'],
     }
-    response = render(request, 'dashboard.html', context)
-    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response['Pragma'] = 'no-cache'
-    response['Expires'] = '0'
-    return response
+    return render(request, 'dashboard.html', context)
+
+
+def _catalog_etag(request):
+    from .catalog import catalog_version
+    return make_etag(catalog_version(), version(STOCK), request.GET.urlencode())
+
+
+@login_required
+@revalidate(_catalog_etag)
+def dashboard_books(request):
+    from django.template.loader import render_to_string
+    from .catalog import filter_books, paginate_books, page_size_from
+    books, next_cursor = paginate_books(
+        filter_books(request.GET),
+        sort=request.GET.get('sort', ''),
+        cursor=request.GET.get('cursor'),
+        limit=page_size_from(request.GET),
+    )
+    html = render_to_string('dashboard_books.html', {'books': books}, request=request)
+    return JsonResponse({
+        'html': html,
+        'count': len(books),
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+    })
 
 
 @login_required
@@ -163,6 +174,7 @@ def return_book(request, borrow_id):
     record = get_object_or_404(Borrow, id=borrow_id, student=request.user.student)
 
     if request.method == 'POST':
+        was_returned = record.is_returned
         # Calculate fine BEFORE setting is_returned=True
         calculated_fine = record.calculate_fine()
         record.fine_amount = calculated_fine
@@ -172,6 +184,11 @@ def return_book(request, borrow_id):
         record.return_date = timezone.now()
         record.save()
 
+        from .fines import post_return_adjustments
+        post_return_adjustments([record.id])
+        if not was_returned:
+            borrows_returned([record.id])
+
         LogEntry.objects.log_action(
             user_id=request.user.id,
             content_type_id=ContentType.objects.get_for_model(record).pk,
@@ -212,83 +229,10 @@ def my_borrowed_books(request):
     })
 
 
-import logging as _logging
-_notif_logger = _logging.getLogger(__name__)
-
-
-def create_notification(student, message, link=''):
-    try:
-        Notification.objects.create(student=student, message=message, link=link)
-        # Keep only the 50 most recent notifications per student
-        old_ids = list(
-            Notification.objects.filter(student=student)
-            .order_by('-created_at')
-            .values_list('id', flat=True)[50:]
-        )
-        if old_ids:
-            Notification.objects.filter(id__in=old_ids).delete()
-    except Exception as exc:
-        _notif_logger.error(
-            "create_notification failed for student %s: %s",
-            getattr(student, 'roll_no', student),
-            exc,
-            exc_info=True,
-        )
-
-
-def send_due_soon_notifications():
-    """
-    Create in-app notifications for students whose active borrows are due
-    within 3 days. Deduplicates: one reminder per borrow per 24-hour window.
-    Call this from views or management commands to drive reminders.
-    """
-    try:
-        today = timezone.now().date()
-        due_soon_borrows = (
-            Borrow.objects.filter(
-                is_returned=False,
-                status='approved',
-                expected_return_date__isnull=False,
-                expected_return_date__lte=today + timezone.timedelta(days=3),
-                expected_return_date__gte=today,
-            )
-            .select_related('student', 'book')
-        )
-        cutoff = timezone.now() - timezone.timedelta(hours=24)
-        for borrow in due_soon_borrows:
-            days_left = (borrow.expected_return_date - today).days
-            if days_left == 0:
-                day_str = "today"
-            elif days_left == 1:
-                day_str = "tomorrow"
-            else:
-                day_str = f"in {days_left} days"
-            msg_prefix = f'Reminder: "{borrow.book.title}" is due {day_str}.'
-            already_notified = Notification.objects.filter(
-                Q(message__startswith=f'Reminder: "{borrow.book.title}" is due') |
-                Q(message__startswith=f"Reminder: '{borrow.book.title}' is due"),
-                student=borrow.student,
-                created_at__gte=cutoff,
-            ).exists()
-            if not already_notified:
-                create_notification(
-                    borrow.student,
-                    f'{msg_prefix} Return it on time to avoid a fine.',
-                    '/my-borrowed-books/',
-                )
-    except Exception as exc:
-        _notif_logger.error("send_due_soon_notifications failed: %s", exc, exc_info=True)
-
-
-@login_required
-def notifications_json(request):
-    if not hasattr(request.user, 'student'):
-        return JsonResponse({'error': 'forbidden'}, status=403)
-    student = request.user.student
+def _notification_payload(student):
     notifs = Notification.objects.filter(student=student).order_by('-created_at')[:10]
-    unread_count = Notification.objects.filter(student=student, is_read=False).count()
-    data = {
-        'unread_count': unread_count,
+    return {
+        'unread_count': unread_count(student.id),
         'notifications': [
             {
                 'id': n.id,
@@ -300,7 +244,33 @@ def notifications_json(request):
             for n in notifs
         ],
     }
-    return JsonResponse(data)
+
+
+def _notifications_etag(request):
+    if not hasattr(request.user, 'student'):
+        return None
+    return make_etag(request.user.student.id, notification_version(request.user.student.id))
+
+
+@login_required
+@revalidate(_notifications_etag)
+def notifications_json(request):
+    if not hasattr(request.user, 'student'):
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    return JsonResponse(_notification_payload(request.user.student))
+
+
+@login_required
+def notifications_stream(request):
+    """Push the bell's unread count and latest notifications when they change."""
+    if not hasattr(request.user, 'student'):
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    student = request.user.student
+    return live_response(
+        request,
+        lambda: notification_version(student.id),
+        lambda: _notification_payload(student),
+    )
 
 
 @require_POST
@@ -313,6 +283,7 @@ def mark_notification_read(request, notif_id):
         Notification.objects.filter(student=student, is_read=False).update(is_read=True)
     else:
         Notification.objects.filter(id=notif_id, student=student).update(is_read=True)
+    notifications_changed([student.id])
     return JsonResponse({'ok': True})
 
 
@@ -323,10 +294,11 @@ def notifications_list(request):
     student = request.user.student
     from django.core.paginator import Paginator
     all_notifs = Notification.objects.filter(student=student).order_by('-created_at')
-    unread_count = all_notifs.filter(is_read=False).count()
+    unread = unread_count(student.id)
 
     if request.method == 'POST' and request.POST.get('action') == 'mark_all_read':
         Notification.objects.filter(student=student, is_read=False).update(is_read=True)
+        notifications_changed([student.id])
         return redirect('notifications_list')
 
     paginator = Paginator(all_notifs, 20)
@@ -335,7 +307,7 @@ def notifications_list(request):
 
     return render(request, 'notifications.html', {
         'page_obj': page_obj,
-        'unread_count': unread_count,
+        'unread_count': unread,
         'student': student,
     })
 
@@ -354,11 +326,20 @@ def submit_review(request, book_id):
         messages.error(request, 'Please select a rating between 1 and 5.')
         return redirect('my_borrowed_books')
     review_text = request.POST.get('review_text', '').strip()[:200]
-    BookReview.objects.update_or_create(
-        student=student,
-        book=book,
-        defaults={'rating': int(raw_rating), 'review_text': review_text},
-    )
+    rating = int(raw_rating)
+    with transaction.atomic():
+        previous = (
+            BookReview.objects.select_for_update()
+            .filter(student=student, book=book)
+            .values_list('rating', flat=True)
+            .first()
+        )
+        BookReview.objects.update_or_create(
+            student=student,
+            book=book,
+            defaults={'rating': rating, 'review_text': review_text},
+        )
+        Book.apply_rating_change(book.id, old_rating=previous, new_rating=rating)
     messages.success(request, f'Thanks for rating "{book.title}"!')
     return redirect('my_borrowed_books')
 
@@ -471,7 +452,7 @@ def admin_logout_view(request):
 
 
 def _get_dashboard_chart_data(date_from, date_to):
-    from django.db.models import Count
+    from django.db.models import Count, Sum
     from django.db.models.functions import TruncMonth
 
     month_starts = []
@@ -484,12 +465,16 @@ def _get_dashboard_chart_data(date_from, date_to):
         else:
             d = d.replace(month=d.month + 1)
 
+    # Borrow counts come from the per-day rollup, so the cost depends on
+    # the range and not on how many borrows there are.
+    daily_borrows = DailyCirculationStats.objects.filter(
+        date__gte=date_from, date__lte=date_to, borrows__gt=0,
+    )
     monthly_borrows_qs = (
-        Borrow.objects
-        .filter(borrow_date__gte=date_from, borrow_date__lte=date_to)
-        .annotate(month=TruncMonth('borrow_date'))
+        daily_borrows
+        .annotate(month=TruncMonth('date'))
         .values('month')
-        .annotate(count=Count('id'))
+        .annotate(count=Sum('borrows'))
     )
     monthly_map = {entry['month'].replace(day=1): entry['count'] for entry in monthly_borrows_qs}
     monthly_labels = [ms.strftime('%b %Y') for ms in month_starts]
@@ -502,10 +487,9 @@ def _get_dashboard_chart_data(date_from, date_to):
     category_counts = [b['count'] for b in books_by_cat]
 
     top_books = list(
-        Borrow.objects
-        .filter(borrow_date__gte=date_from, borrow_date__lte=date_to)
+        daily_borrows
         .values('book__title')
-        .annotate(count=Count('id'))
+        .annotate(count=Sum('borrows'))
         .order_by('-count')[:5]
     )
     top_book_labels = [b['book__title'] for b in top_books]
@@ -545,7 +529,16 @@ def _default_date_range():
     return d, today
 
 
+def _chart_data_etag(request):
+    from datetime import date
+    from .catalog import catalog_version
+    # Borrow and Student writes move PENDING and Book writes move the catalog
+    # version; today's date covers the default range rolling over.
+    return make_etag(catalog_version(), version(PENDING), request.GET.urlencode(), date.today())
+
+
 @admin_login_required
+@revalidate(_chart_data_etag)
 def admin_dashboard_chart_data(request):
     from datetime import date
     date_from_default, date_to_default = _default_date_range()
@@ -572,9 +565,10 @@ def admin_dashboard_view(request):
 
     total_students = Student.objects.count()
     total_books = Book.objects.count()
-    pending_requests = Borrow.objects.filter(status='pending').count()
+    pending_requests = pending_counts()['borrow_pending']
     total_admins = Admin.objects.count()
-    total_fines = Borrow.objects.filter(fine_amount__gt=0).aggregate(Sum('fine_amount'))['fine_amount__sum'] or 0
+    # Outstanding fines, read from the ledger-maintained per-student balances.
+    total_fines = Student.objects.aggregate(total=Sum('fine_balance'))['total'] or 0
 
     date_from_default, date_to_default = _default_date_range()
     chart_data = _get_dashboard_chart_data(date_from_default, date_to_default)
@@ -644,11 +638,7 @@ def admin_delete_student_view(request, student_id):
 
 @admin_login_required
 def admin_manage_books_view(request):
-    from django.db.models import Avg, Count
-    books = Book.objects.annotate(
-        avg_rating=Avg('reviews__rating'),
-        review_count=Count('reviews'),
-    )
+    books = Book.objects.all()
     context = {
         'admin': request.admin,
         'books': books,
@@ -680,7 +670,8 @@ def admin_edit_book_view(request, book_id):
     if request.method == 'POST':
         form = BookForm(request.POST, instance=book)
         if form.is_valid():
-            form.save()
+            # Only write the edited columns so concurrent review/stock updates survive.
+            form.save(commit=False).save(update_fields=form.Meta.fields)
             messages.success(request, f'Book "{book.title}" updated successfully!')
             return redirect('admin_manage_books')
     else:
@@ -706,74 +697,140 @@ def admin_delete_book_view(request, book_id):
 
 
 @admin_login_required
+@revalidate(lambda request: make_etag(version(PENDING)))
 def admin_pending_counts_json(request):
-    borrow_count = Borrow.objects.filter(status='pending').count()
-    signup_count = Student.objects.filter(status='pending').count()
-    response = JsonResponse({'borrow_pending': borrow_count, 'signup_pending': signup_count})
-    response['Cache-Control'] = 'no-store'
-    return response
+    return JsonResponse(pending_counts())
+
+
+@admin_login_required
+def admin_pending_counts_stream(request):
+    """Push the sidebar's pending borrow/signup counts when they change."""
+    return live_response(request, lambda: version(PENDING), pending_counts)
+
+
+BORROW_PAGE_SIZE = 50
+BORROW_STATUS_FILTERS = ('pending', 'approved', 'rejected', 'returned')
+
+
+def _filter_borrows(params):
+    from datetime import date
+    borrows = Borrow.objects.all()
+    status = params.get('status', '')
+    if status == 'returned':
+        borrows = borrows.filter(is_returned=True)
+    elif status == 'approved':
+        borrows = borrows.filter(status='approved', is_returned=False)
+    elif status in BORROW_STATUS_FILTERS:
+        borrows = borrows.filter(status=status)
+    for param, lookup in (('date_from', 'borrow_date__gte'), ('date_to', 'borrow_date__lte')):
+        try:
+            value = date.fromisoformat(params.get(param, ''))
+        except ValueError:
+            continue
+        borrows = borrows.filter(**{lookup: value})
+    student = params.get('student', '').strip()
+    if student:
+        borrows = borrows.filter(Q(student__roll_no__icontains=student) | Q(student__name__icontains=student))
+    return borrows
+
+
+def _resolve_waiver(borrow):
+    """Pick the waiver to display from the prefetched waivers (no extra query)."""
+    waivers = list(borrow.waivers.all())
+    for status in ('approved', 'pending', 'rejected'):
+        waiver = next((w for w in waivers if w.status == status), None)
+        if waiver:
+            return status, waiver
+    return None, None
 
 
 @admin_login_required
 def admin_borrow_requests_view(request):
-    borrows = Borrow.objects.all().select_related('student', 'student__user', 'book').prefetch_related('waivers').order_by('-borrow_date')
-    for borrow in borrows:
-        approved = borrow.waivers.filter(status='approved').first()
-        pending = borrow.waivers.filter(status='pending').first()
-        rejected = borrow.waivers.filter(status='rejected').first()
-        if approved:
-            borrow.waiver_status = 'approved'
-            borrow.waiver_amount = approved.waived_amount
-        elif pending:
-            borrow.waiver_status = 'pending'
-            borrow.waiver_amount = pending.waived_amount
-        elif rejected:
-            borrow.waiver_status = 'rejected'
-            borrow.waiver_amount = rejected.waived_amount
-        else:
-            borrow.waiver_status = None
-            borrow.waiver_amount = None
+    from urllib.parse import urlencode
+    from django.db.models import Prefetch
+    from .catalog import cursor_date, cursor_int, decode_cursor, encode_cursor
+
+    matching = _filter_borrows(request.GET)
+    borrows = matching.order_by('-borrow_date', '-id')
+    position = decode_cursor(request.GET.get('cursor'), (cursor_date, cursor_int))
+    if position is not None:
+        last_date, last_id = position
+        borrows = borrows.filter(Q(borrow_date__lt=last_date) | Q(borrow_date=last_date, id__lt=last_id))
+
+    page = list(
+        borrows.select_related('student', 'student__user', 'book')
+        .prefetch_related(Prefetch(
+            'waivers',
+            queryset=FineWaiver.objects.only('id', 'borrow_id', 'status', 'waived_amount').order_by('-created_at'),
+        ))[:BORROW_PAGE_SIZE + 1]
+    )
+    next_cursor = None
+    if len(page) > BORROW_PAGE_SIZE:
+        page = page[:BORROW_PAGE_SIZE]
+        next_cursor = encode_cursor([page[-1].borrow_date.isoformat(), page[-1].id])
+
+    for borrow in page:
+        status, waiver = _resolve_waiver(borrow)
+        borrow.waiver_status = status
+        borrow.waiver_amount = waiver.waived_amount if waiver else None
+
+    filters = {
+        key: request.GET.get(key, '').strip()
+        for key in ('status', 'date_from', 'date_to', 'student')
+        if request.GET.get(key, '').strip()
+    }
     context = {
         'admin': request.admin,
-        'borrows': borrows,
+        'borrows': page,
+        'filters': filters,
+        'status_filters': BORROW_STATUS_FILTERS,
+        # Only worth a COUNT when the filter spans more than one page.
+        'matching_count': matching.count() if next_cursor or position is not None else len(page),
+        'is_first_page': position is None,
+        'first_page_query': urlencode(filters),
+        'next_page_query': urlencode({**filters, 'cursor': next_cursor}) if next_cursor else None,
     }
     return render(request, 'admin_borrow_requests.html', context)
 
 
 @admin_login_required
 def admin_approve_borrow_view(request, borrow_id):
-    borrow_request = get_object_or_404(Borrow, id=borrow_id)
+    borrow_request = get_object_or_404(Borrow.objects.select_related('book', 'student'), id=borrow_id)
     book = borrow_request.book
     
     if request.method == 'POST':
-        if borrow_request.status != 'approved':
-            if book.quantity > 0:
-                book.quantity -= 1
-                book.save()
-                
-                borrow_request.status = 'approved'
-                borrow_request.is_approved = True
-                borrow_request.approve_date = timezone.now()
-                borrow_request.save()
-                
-                try:
-                    from .notifications import send_borrow_confirmation
-                    send_borrow_confirmation(borrow_request)
-                except Exception as e:
-                    import logging
-                    logging.getLogger(__name__).error(f"Failed to send borrow confirmation email: {e}")
-                    messages.warning(request, 'Borrow approved but confirmation email could not be sent.')
-                
-                create_notification(
-                    borrow_request.student,
-                    f'Your borrow request for "{book.title}" has been approved.',
-                    '/my-borrowed-books/',
-                )
-                messages.success(request, f'Borrow request approved for {borrow_request.student.roll_no}!')
-            else:
-                messages.error(request, 'Book is out of stock!')
-        else:
+        with transaction.atomic():
+            # Claim the request first so a double-submitted approval cannot
+            # take two copies, then reserve stock with a conditional UPDATE.
+            claimed = (
+                Borrow.objects.filter(id=borrow_id)
+                .exclude(status='approved')
+                .update(status='approved', is_approved=True)
+            )
+            in_stock = bool(claimed) and Book.take_copy(book.id)
+            if claimed and not in_stock:
+                transaction.set_rollback(True)
+            elif claimed:
+                from .notifications import send_borrow_confirmation
+                send_borrow_confirmation(borrow_request)
+                pending_changed()
+                if borrow_request.status == 'rejected':
+                    borrows_rejected([borrow_id], undo=True)
+
+        if not claimed:
             messages.info(request, 'This request is already approved.')
+        elif not in_stock:
+            messages.error(request, 'Book is out of stock!')
+        else:
+            borrow_request.status = 'approved'
+            borrow_request.is_approved = True
+            
+            create_notification(
+                borrow_request.student,
+                f'Your borrow request for "{book.title}" has been approved.',
+                '/my-borrowed-books/',
+            )
+            messages.success(request, f'Borrow request approved for {borrow_request.student.roll_no}!')
     
     return redirect('admin_borrow_requests')
 
@@ -793,6 +850,7 @@ def admin_reject_borrow_view(request, borrow_id):
             borrow_request.status = 'rejected'
             borrow_request.reject_reason = reject_reason
             borrow_request.save()
+            borrows_rejected([borrow_request.id])
             create_notification(
                 borrow_request.student,
                 f'Your borrow request for "{borrow_request.book.title}" was rejected. Reason: {reject_reason}',
@@ -807,7 +865,7 @@ def admin_reject_borrow_view(request, borrow_id):
 
 @admin_login_required
 def admin_return_book_view(request, borrow_id):
-    borrow_record = get_object_or_404(Borrow, id=borrow_id)
+    borrow_record = get_object_or_404(Borrow.objects.select_related('book', 'student'), id=borrow_id)
     
     if request.method == 'POST':
         # Verify borrow is approved before allowing return
@@ -815,22 +873,25 @@ def admin_return_book_view(request, borrow_id):
             messages.error(request, 'Only approved borrow requests can be returned.')
             return redirect('admin_borrow_requests')
         
-        if not borrow_record.is_returned:
-            # Calculate fine BEFORE setting is_returned=True
-            calculated_fine = borrow_record.calculate_fine()
-            borrow_record.fine_amount = calculated_fine
-            
-            # Mark as returned
-            borrow_record.is_returned = True
-            borrow_record.return_date = timezone.now()
-            
-            # Increment book quantity back
-            book = borrow_record.book
-            book.quantity += 1
-            book.save()
-            
-            borrow_record.save()
-            
+        # Calculate fine BEFORE marking as returned
+        calculated_fine = borrow_record.calculate_fine()
+        
+        with transaction.atomic():
+            # Only the request that flips is_returned restocks the book.
+            returned = Borrow.objects.filter(
+                id=borrow_id, status='approved', is_returned=False,
+            ).update(
+                is_returned=True,
+                return_date=timezone.localdate(),
+                fine_amount=calculated_fine,
+            )
+            if returned:
+                from .fines import post_return_adjustments
+                Book.return_copy(borrow_record.book_id)
+                post_return_adjustments([borrow_id])
+                borrows_returned([borrow_id])
+        
+        if returned:
             if calculated_fine > 0:
                 create_notification(
                     borrow_record.student,
@@ -851,6 +912,159 @@ def admin_return_book_view(request, borrow_id):
     return redirect('admin_borrow_requests')
 
 
+def _bulk_approve_borrows(borrow_ids):
+    """
+    Approve pending requests in one transaction, first come first served per
+    book. Stock is taken with one guarded UPDATE per distinct book and the
+    borrow rows flip in a single UPDATE. Returns (approved, out_of_stock), or
+    None if the batch was rolled back because it changed concurrently.
+
+    ``borrow_ids`` is a list of ids or a ``values('id')`` queryset, which the
+    bulk helpers run as a subquery.
+    """
+    from collections import defaultdict
+    with transaction.atomic():
+        pending = list(
+            Borrow.objects.select_for_update()
+            .filter(id__in=borrow_ids, status='pending')
+            .order_by('id')
+            .values_list('id', 'book_id')
+        )
+        requested = defaultdict(list)
+        for borrow_id, book_id in pending:
+            requested[book_id].append(borrow_id)
+
+        approved_ids = []
+        for book_id, ids in requested.items():
+            taken = Book.take_copies(book_id, len(ids))
+            approved_ids.extend(ids[:taken])
+
+        flipped = Borrow.objects.filter(id__in=approved_ids, status='pending').update(
+            status='approved', is_approved=True,
+        )
+        if flipped != len(approved_ids):
+            # Another admin changed part of the batch underneath us.
+            transaction.set_rollback(True)
+            return None
+        pending_changed()
+
+        approved = list(
+            Borrow.objects.filter(id__in=approved_ids)
+            .select_related('student', 'student__user', 'book')
+        )
+        create_notifications_bulk([
+            (b.student, f'Your borrow request for "{b.book.title}" has been approved.', '/my-borrowed-books/')
+            for b in approved
+        ])
+        from .notifications import send_borrow_confirmations
+        send_borrow_confirmations(approved)
+    return len(approved), len(pending) - len(approved)
+
+
+def _bulk_reject_borrows(borrow_ids, reject_reason):
+    with transaction.atomic():
+        pending = list(
+            Borrow.objects.select_for_update()
+            .filter(id__in=borrow_ids, status='pending')
+            .select_related('student', 'book')
+        )
+        Borrow.objects.filter(id__in=[b.id for b in pending], status='pending').update(
+            status='rejected', reject_reason=reject_reason,
+        )
+        borrows_rejected([b.id for b in pending])
+        pending_changed()
+        create_notifications_bulk([
+            (b.student, f'Your borrow request for "{b.book.title}" was rejected. Reason: {reject_reason}', '/my-borrowed-books/')
+            for b in pending
+        ])
+    return len(pending)
+
+
+def _bulk_return_borrows(borrow_ids):
+    from collections import Counter
+    from django.db.models import Case, When, Value, DecimalField
+    from decimal import Decimal
+    from .fines import annotate_live_fines, post_return_adjustments
+    with transaction.atomic():
+        # Fines for the whole batch come from one query, waivers included.
+        borrows = list(annotate_live_fines(
+            Borrow.objects.select_for_update()
+            .filter(id__in=borrow_ids, status='approved', is_returned=False)
+            .select_related('student', 'book')
+        ))
+        if not borrows:
+            return 0, 0
+        # live_fine falls back to the stored fine_amount when a loan is not
+        # overdue; calculate_fine() says 0 there, and so do we.
+        fines = {b.id: b.live_fine if b.overdue_days else Decimal('0.00') for b in borrows}
+        Borrow.objects.filter(id__in=fines, is_returned=False).update(
+            is_returned=True,
+            return_date=timezone.localdate(),
+            fine_amount=Case(
+                *[When(id=borrow_id, then=Value(fine)) for borrow_id, fine in fines.items()],
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+        for book_id, count in Counter(b.book_id for b in borrows).items():
+            Book.return_copy(book_id, count)
+        post_return_adjustments(list(fines))
+        borrows_returned(list(fines))
+
+        items = []
+        for b in borrows:
+            fine = fines[b.id]
+            if fine > 0:
+                message = f'A late fine of ₹{fine:.2f} has been applied for returning "{b.book.title}" late.'
+            else:
+                message = f'Your book "{b.book.title}" has been marked as returned. Thank you!'
+            items.append((b.student, message, '/my-borrowed-books/'))
+        create_notifications_bulk(items)
+    return len(borrows), sum(1 for fine in fines.values() if fine > 0)
+
+
+@require_POST
+@admin_login_required
+def admin_bulk_borrow_action_view(request):
+    action = request.POST.get('action', '')
+    if request.POST.get('scope') == 'filter':
+        # Every request matching the list filters, not just the page shown.
+        borrow_ids = _filter_borrows(request.POST).values('id')
+    else:
+        borrow_ids = [int(i) for i in request.POST.getlist('borrow_ids') if i.isdigit()]
+        if not borrow_ids:
+            messages.error(request, 'Select at least one borrow request.')
+            return redirect('admin_borrow_requests')
+
+    if action == 'approve':
+        result = _bulk_approve_borrows(borrow_ids)
+        if result is None:
+            messages.error(request, 'Some requests changed while approving. Nothing was approved; please try again.')
+            return redirect('admin_borrow_requests')
+        approved, out_of_stock = result
+        if approved:
+            messages.success(request, f'Approved {approved} borrow request(s).')
+        if out_of_stock:
+            messages.error(request, f'{out_of_stock} request(s) could not be approved: book out of stock.')
+        if not approved and not out_of_stock:
+            messages.info(request, 'None of the selected requests are pending.')
+    elif action == 'reject':
+        reject_reason = request.POST.get('reject_reason', '').strip()
+        if not reject_reason:
+            messages.error(request, 'Reject reason is required.')
+            return redirect('admin_borrow_requests')
+        rejected = _bulk_reject_borrows(borrow_ids, reject_reason)
+        messages.warning(request, f'Rejected {rejected} borrow request(s).')
+    elif action == 'return':
+        returned, fined = _bulk_return_borrows(borrow_ids)
+        messages.success(request, f'Marked {returned} book(s) as returned.')
+        if fined:
+            messages.warning(request, f'{fined} of them were returned late and charged a fine.')
+    else:
+        messages.error(request, 'Unknown bulk action.')
+
+    return redirect('admin_borrow_requests')
+
+
 @superadmin_required
 def admin_manage_admins_view(request):
     admins = Admin.objects.all()
@@ -1132,11 +1346,7 @@ def admin_signup_requests(request):
         'admin': request.admin,
         'pending_students': pending_students,
     }
-    response = render(request, 'admin_signup_requests.html', context)
-    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response['Pragma'] = 'no-cache'
-    response['Expires'] = '0'
-    return response
+    return render(request, 'admin_signup_requests.html', context)
 
 
 @admin_login_required
@@ -1146,16 +1356,12 @@ def admin_approve_student(request, student_id):
         if student.status == 'approved':
             messages.info(request, f'Student {student.roll_no} is already approved.')
             return redirect('admin_signup_requests')
-        student.status = 'approved'
-        student.status_reason = None
-        student.save()
-        try:
-            from .notifications import send_signup_approved_notification
+        from .notifications import send_signup_approved_notification
+        with transaction.atomic():
+            student.status = 'approved'
+            student.status_reason = None
+            student.save()
             send_signup_approved_notification(student)
-        except Exception as e:
-            import logging
-            logging.getLogger(__name__).error(f"Failed to send signup approved email: {e}")
-            messages.warning(request, 'Student approved but notification email could not be sent.')
         create_notification(
             student,
             'Your library account has been approved! You can now borrow books.',
@@ -1171,16 +1377,12 @@ def admin_reject_student(request, student_id):
         student = get_object_or_404(Student, id=student_id)
         reject_reason = request.POST.get('reject_reason', '')
         if reject_reason:
-            student.status = 'rejected'
-            student.status_reason = reject_reason
-            student.save()
-            try:
-                from .notifications import send_signup_rejected_notification
+            from .notifications import send_signup_rejected_notification
+            with transaction.atomic():
+                student.status = 'rejected'
+                student.status_reason = reject_reason
+                student.save()
                 send_signup_rejected_notification(student, reject_reason)
-            except Exception as e:
-                import logging
-                logging.getLogger(__name__).error(f"Failed to send signup rejected email: {e}")
-                messages.warning(request, 'Student rejected but notification email could not be sent.')
             create_notification(
                 student,
                 f'Your library account application was rejected. Reason: {reject_reason}',
@@ -1307,10 +1509,12 @@ def admin_export_fines_pdf(request):
     from reportlab.lib.units import mm
     from datetime import datetime
 
-    borrows = Borrow.objects.filter(
+    from .fines import annotate_live_fines
+
+    borrows = annotate_live_fines(Borrow.objects.filter(
         Q(fine_amount__gt=0) | Q(status='approved', is_returned=False,
-                                  expected_return_date__lt=timezone.now().date())
-    ).select_related('student', 'student__user', 'book').prefetch_related('waivers').order_by('-borrow_date')
+                                  expected_return_date__lt=timezone.localdate())
+    )).select_related('student', 'student__user', 'book').prefetch_related('waivers').order_by('-borrow_date')
 
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(
@@ -1343,23 +1547,13 @@ def admin_export_fines_pdf(request):
                'Overdue Days', 'Return Status', 'Fine (₹)', 'Waiver Status', 'Waiver Amt (₹)']
     data = [headers]
 
-    today = timezone.now().date()
     for i, b in enumerate(borrows, start=1):
-        if b.expected_return_date:
-            if b.is_returned and b.return_date:
-                return_day = b.return_date.date() if hasattr(b.return_date, 'date') else b.return_date
-                overdue_days = max(0, (return_day - b.expected_return_date).days)
-            elif not b.is_returned:
-                overdue_days = max(0, (today - b.expected_return_date).days)
-            else:
-                overdue_days = 0
+        if b.is_returned and b.return_date and b.expected_return_date:
+            return_day = b.return_date.date() if hasattr(b.return_date, 'date') else b.return_date
+            overdue_days = max(0, (return_day - b.expected_return_date).days)
         else:
-            overdue_days = 0
-
-        if not b.is_returned and b.expected_return_date and b.expected_return_date < today:
-            live_fine = b.calculate_fine()
-        else:
-            live_fine = float(b.fine_amount)
+            overdue_days = b.overdue_days
+        live_fine = b.live_fine
 
         # Resolve waiver status from prefetched set — avoids per-row DB queries
         all_waivers = list(b.waivers.all())
@@ -1558,18 +1752,18 @@ def delete_comment(request, comment_id):
 
 @admin_login_required
 def admin_manage_fines_view(request):
-    from django.db.models import Sum, Q
-    borrows_with_fines = Borrow.objects.filter(
-        Q(fine_amount__gt=0) | Q(status='approved', is_returned=False, expected_return_date__lt=timezone.now().date())
-    ).select_related('student', 'student__user', 'book').order_by('-borrow_date')
+    from django.db.models import Prefetch
+    from .fines import annotate_live_fines
+    borrows_with_fines = list(annotate_live_fines(Borrow.objects.filter(
+        Q(fine_amount__gt=0) | Q(status='approved', is_returned=False, expected_return_date__lt=timezone.localdate())
+    )).select_related('student', 'student__user', 'book').prefetch_related(Prefetch(
+        'waivers', queryset=FineWaiver.objects.filter(status__in=('pending', 'approved')).order_by('id'),
+    )).order_by('-borrow_date'))
 
     for borrow in borrows_with_fines:
-        if not borrow.is_returned and borrow.expected_return_date and borrow.expected_return_date < timezone.now().date():
-            borrow.live_fine = borrow.calculate_fine()
-        else:
-            borrow.live_fine = float(borrow.fine_amount)
-        borrow.active_waiver = borrow.waivers.filter(status='pending').first()
-        borrow.approved_waiver = borrow.waivers.filter(status='approved').first()
+        waivers = list(borrow.waivers.all())
+        borrow.active_waiver = next((w for w in waivers if w.status == 'pending'), None)
+        borrow.approved_waiver = next((w for w in waivers if w.status == 'approved'), None)
 
     pending_waivers = FineWaiver.objects.filter(status='pending').select_related(
         'borrow', 'borrow__student', 'borrow__book', 'requested_by'
@@ -1649,7 +1843,9 @@ def admin_approve_waiver_view(request, waiver_id):
             borrow.fine_amount = new_fine
             borrow.save()
 
-        try:
+            from .fines import post_waiver
+            post_waiver(waiver)
+
             from .notifications import send_fine_waiver_notification
             send_fine_waiver_notification(
                 borrow,
@@ -1657,10 +1853,6 @@ def admin_approve_waiver_view(request, waiver_id):
                 waiver.original_fine,
                 new_fine,
             )
-        except Exception as e:
-            import logging
-            logging.getLogger(__name__).error(f"Failed to send waiver notification email: {e}")
-            messages.warning(request, 'Waiver approved but notification email could not be sent.')
 
         messages.success(request, f'Fine waiver approved. New fine: Rs.{new_fine:.2f}')
 
@@ -54,7 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'lms_app.middleware.NoCacheMiddleware',
+    'lms_app.middleware.CachePolicyMiddleware',
 ]
 
 ROOT_URLCONF = 'lms_project.urls'
@@ -109,12 +109,38 @@ def _build_database_config():
     return {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.environ.get('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+        # Take the write lock when a transaction starts and wait for it,
+        # rather than failing with "database is locked" when a reader in
+        # one worker tries to upgrade while another worker is writing.
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+        # File-backed test database: threads in the concurrency tests need
+        # real locking, which the shared-cache in-memory database lacks.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 
 
 DATABASES = {'default': _build_database_config()}
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Must be shared by every process that reads or writes app data (gunicorn
+# workers and the mailer): catalog/counter version bumps made in one are
+# read by the others. The file backend only works when they share a
+# filesystem; separate containers need Redis, memcached or the database
+# cache (see docker-compose.yml).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / '.django_cache')),
+        # Per-student counter and version keys add two entries per active
+        # student; the default of 300 would cull constantly.
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '20000'))},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -190,3 +216,8 @@ else:
     EMAIL_HOST_USER = ''
     DEFAULT_FROM_EMAIL = 'Library Management System <noreply@library.com>'
     _settings_logger.info('Email: console backend (no SMTP credentials configured)')
+
+# Messages sent over one SMTP connection before it is closed and re-opened.
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', 50))
+# Cap on messages per second across all send_notifications workers; 0 = no cap.
+EMAIL_RATE_LIMIT = float(os.environ.get('EMAIL_RATE_LIMIT', 0))
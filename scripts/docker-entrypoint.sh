@@ -3,6 +3,7 @@ set -e
 
 echo "Running migrations..."
 python manage.py migrate --noinput
+python manage.py createcachetable
 
 echo "Bootstrapping initial admin (if configured)..."
 python manage.py bootstrap_admin
@@ -14,9 +15,12 @@ echo "Seeding books..."
 python manage.py seed_books
 
 echo "Starting gunicorn on 0.0.0.0:5000"
+# Threads let the short notification long polls (see lms_app/live.py) wait
+# without tying up a whole worker.
 exec gunicorn \
     --bind 0.0.0.0:5000 \
     --workers 3 \
+    --threads 8 \
     --access-logfile - \
     --error-logfile - \
     lms_project.wsgi:application